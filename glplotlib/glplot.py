@@ -1,9 +1,13 @@
-from pyqtgraph.Qt import QtCore, QtGui
+from pyqtgraph.Qt import QtCore, QtGui, QtOpenGL
 import pyqtgraph.opengl as gl
 import numpy as np
+import concurrent.futures
 import threading
+import time
+import sys
 
 from glplotlib import utilites
+from glplotlib import items
 
 
 class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
@@ -17,6 +21,8 @@ class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
     add_item_delegate_signal = QtCore.pyqtSignal(object, object)
     method_delegate_signal = QtCore.pyqtSignal(object, object)
     function_delegate_signal = QtCore.pyqtSignal(object, object)
+    post_function_signal = QtCore.pyqtSignal(object, object)
+    repaint_request_signal = QtCore.pyqtSignal()
 
     def __init__(self, parent=None):
         """
@@ -29,11 +35,22 @@ class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
         self.execute_result = None
         self.real_close = False
 
+        self.item_viewed = {}
+        self.render_on_demand = False
+        self.dirty = True
+        self.frame_cache = None
+        self.repaint_timer = QtCore.QTimer()
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(16)
+        self.repaint_timer.timeout.connect(self.repaint_timer_slot)
+        self.repaint_request_signal.connect(self.repaint_request_slot)
+
         self.clear_signal.connect(self.clear_slot)
         self.add_item_delegate_signal.connect(self.add_item_delegate_slot)
         self.method_delegate_signal.connect(self.method_delegate_slot)
         self.exit_signal.connect(self.exit_slot)
         self.function_delegate_signal.connect(self.function_delegate_slot)
+        self.post_function_signal.connect(self.post_function_slot)
 
     def closeEvent(self, event):
         """
@@ -55,9 +72,32 @@ class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
         Handle to remove all items in current widget.
         :return:
         """
+        for item in self.items:
+            self.free_item(item)
         self.items = []
+        self.item_viewed = {}
         self.update()
 
+    def removeItem(self, item):
+        """
+        Same as GLViewWidget.removeItem, but also releases resources held by items provided by glplotlib.
+        :param item: a pyqtgraph.opengl item, already held by this widget
+        :return:
+        """
+        super(GPGLViewWidget, self).removeItem(item)
+        self.item_viewed.pop(item, None)
+        self.free_item(item)
+
+    def free_item(self, item):
+        """
+        Release GL buffers, programs and threads of a item with the GL context current, if it holds any.
+        :param item: a pyqtgraph.opengl item
+        :return:
+        """
+        if hasattr(item, 'free'):
+            self.makeCurrent()
+            item.free()
+
     @QtCore.pyqtSlot(object, object)
     def add_item_delegate_slot(self, func, params):
         """
@@ -119,6 +159,23 @@ class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
             self.execute_result = error
         self.execute_event.set()
 
+    @QtCore.pyqtSlot(object, object)
+    def post_function_slot(self, func, params):
+        """
+        Handle to call a function in the same thread as this widget, without waiting for the result.
+        :param func: the function object to be called
+        :param params: parameters passed to the function, can be either dict or iterable.
+        :return:
+        """
+        try:
+            if type(params) is dict:
+                func(**params)
+            else:
+                iterator = iter(params)
+                func(*iterator)
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+
     @QtCore.pyqtSlot()
     def exit_slot(self):
         """
@@ -128,6 +185,96 @@ class GPGLViewWidget(gl.GLViewWidget, QtCore.QObject):
         self.real_close = True
         self.close()
 
+    def update(self):
+        """
+        Marks the scene dirty and schedules a repaint.
+
+        Safe to call from any thread. In render on demand mode, repaint requests are
+        coalesced to at most one per frame interval.
+        :return:
+        """
+        self.dirty = True
+        if getattr(self, 'repaint_timer', None) is None:
+            # called by GLViewWidget.__init__, before the timer exists
+            super(GPGLViewWidget, self).update()
+        elif QtCore.QThread.currentThread() != self.thread():
+            self.repaint_request_signal.emit()
+        elif self.render_on_demand:
+            if not self.repaint_timer.isActive():
+                self.repaint_timer.start()
+        else:
+            super(GPGLViewWidget, self).update()
+
+    @QtCore.pyqtSlot()
+    def repaint_request_slot(self):
+        """
+        Handle to schedule a repaint requested from another thread.
+        :return:
+        """
+        self.update()
+
+    @QtCore.pyqtSlot()
+    def repaint_timer_slot(self):
+        """
+        Handle that performs the coalesced repaint at the end of a frame interval.
+        :return:
+        """
+        super(GPGLViewWidget, self).update()
+
+    def set_render_on_demand(self, enabled=True, frame_interval=16):
+        """
+        Enables or disables damage tracking render mode.
+
+        When enabled, the scene is only re-rendered after items, options or camera changed.
+        The last rendered frame is cached in a framebuffer object and reused on expose events.
+        :param enabled: Bool
+        :param frame_interval: minimum interval between two repaints in milliseconds.
+        :return:
+        """
+        self.render_on_demand = enabled
+        self.repaint_timer.setInterval(frame_interval)
+        if not enabled:
+            self.frame_cache = None
+        self.update()
+
+    def paintGL(self, region=None, viewport=None, useItemNames=False):
+        """
+        Same as GLViewWidget.paintGL, but reuses the cached frame when the scene is not dirty.
+
+        Picking and offscreen rendering (region or viewport specified) always bypass the cache.
+        :param region: sub-region of the viewport to be rendered.
+        :param viewport: arguments to glViewport.
+        :param useItemNames: used for picking.
+        :return:
+        """
+        if region is None and viewport is None and not useItemNames:
+            now = time.time()
+            for item in self.items:
+                if item.visible():
+                    self.item_viewed[item] = now
+
+        if not self.render_on_demand or region is not None or viewport is not None or useItemNames \
+                or not QtOpenGL.QGLFramebufferObject.hasOpenGLFramebufferBlit():
+            super(GPGLViewWidget, self).paintGL(region=region, viewport=viewport, useItemNames=useItemNames)
+            return
+
+        size = QtCore.QSize(self.width(), self.height())
+        if self.frame_cache is None or self.frame_cache.size() != size:
+            self.frame_cache = QtOpenGL.QGLFramebufferObject(size, QtOpenGL.QGLFramebufferObject.Depth)
+            self.dirty = True
+
+        if self.dirty:
+            # clear the flag first, so changes made during painting schedule another frame
+            self.dirty = False
+            self.frame_cache.bind()
+            try:
+                super(GPGLViewWidget, self).paintGL()
+            finally:
+                self.frame_cache.release()
+
+        rect = QtCore.QRect(0, 0, size.width(), size.height())
+        QtOpenGL.QGLFramebufferObject.blitFramebuffer(None, rect, self.frame_cache, rect)
+
     def show_delegate(self, persistent=True):
         """
         Delegate method to external show function
@@ -148,6 +295,10 @@ class GPVisualizer(threading.Thread):
     app = None
     widget = None
     running = threading.Event()
+    records = {}
+    records_lock = threading.Lock()
+    memory_budget = None
+    eviction_policy = 'evict'
 
     def __init__(self):
         """
@@ -219,8 +370,9 @@ class GPVisualizer(threading.Thread):
         cls.widget.execute_result = None
         cls.widget.execute_event_lock.release()
 
-        if type(result) is Exception:
+        if isinstance(result, Exception):
             raise result
+        cls.register_item(result)
         return result
 
     @classmethod
@@ -246,7 +398,7 @@ class GPVisualizer(threading.Thread):
         cls.widget.execute_result = None
         cls.widget.execute_event_lock.release()
 
-        if type(result) is Exception:
+        if isinstance(result, Exception):
             raise result
         return result
 
@@ -266,17 +418,37 @@ class GPVisualizer(threading.Thread):
         if params is None:
             params = dict()
 
-        cls.widget.method_delegate_signal.emit(func, params)
+        cls.widget.function_delegate_signal.emit(func, params)
         cls.widget.execute_event.wait()
 
         result = cls.widget.execute_result
         cls.widget.execute_result = None
         cls.widget.execute_event_lock.release()
 
-        if type(result) is Exception:
+        if isinstance(result, Exception):
             raise result
         return result
 
+    @classmethod
+    def post_function_delegate(cls, func, params=None, wait=True):
+        """
+        Calls a function in the same thread as GPGLViewWidget, without waiting for it to finish.
+
+        :param func: the function object to be called
+        :param params: parameters passed to the function, can be either dict or iterable.
+        :param wait: If True, waits for the event loop to be running. If False, the function is not posted
+        when the event loop is not running.
+        :return: Bool of whether the function was posted.
+        """
+        if wait:
+            cls.running.wait()
+        elif not cls.running.is_set():
+            return False
+        if params is None:
+            params = dict()
+        cls.widget.post_function_signal.emit(func, params)
+        return True
+
     @classmethod
     def clear(cls):
         """
@@ -284,8 +456,106 @@ class GPVisualizer(threading.Thread):
         :return:
         """
         cls.running.wait()
+        cls.forget_item()
         cls.widget.clear_signal.emit()
 
+    @classmethod
+    def register_item(cls, item):
+        """
+        Start tracking the memory used by a item, and enforce the memory budget.
+        :param item: a pyqtgraph.opengl item held by GPGLViewWidget
+        :return:
+        """
+        now = time.time()
+        with cls.records_lock:
+            cls.records[item] = {
+                'name': '{}-{}'.format(type(item).__name__, item._id),
+                'created': now,
+                'updated': now,
+                'cpu_bytes': 0,
+                'gpu_bytes': 0
+            }
+        cls.touch_item(item)
+
+    @classmethod
+    def touch_item(cls, item, enforce=True):
+        """
+        Record that a item was updated, recompute its memory usage, and enforce the memory budget.
+        :param item: a pyqtgraph.opengl item held by GPGLViewWidget
+        :param enforce: If False, the memory budget is not enforced. Must be False in the thread of GPGLViewWidget.
+        :return:
+        """
+        with cls.records_lock:
+            record = cls.records.get(item)
+            if record is None:
+                return
+            record['updated'] = time.time()
+            record['cpu_bytes'], record['gpu_bytes'] = utilites.estimate_item_bytes(item)
+        if enforce:
+            cls.enforce_memory_budget(keep=item)
+
+    @classmethod
+    def forget_item(cls, item=None):
+        """
+        Stop tracking the memory used by a item.
+        :param item: a pyqtgraph.opengl item. If None, all items are forgotten.
+        :return:
+        """
+        with cls.records_lock:
+            if item is None:
+                cls.records.clear()
+            else:
+                cls.records.pop(item, None)
+
+    @classmethod
+    def memory_usage(cls):
+        """
+        Memory used by all tracked items.
+        :return: list of dict with name, item, cpu_bytes, gpu_bytes, updated and viewed time,
+        least recently updated or viewed first.
+        """
+        viewed = dict(cls.widget.item_viewed) if cls.widget is not None else dict()
+        with cls.records_lock:
+            usage = [dict(record, item=item, viewed=viewed.get(item, record['created']))
+                     for item, record in cls.records.items()]
+        usage.sort(key=lambda record: (record['viewed'], record['updated']))
+        return usage
+
+    @classmethod
+    def enforce_memory_budget(cls, keep=None):
+        """
+        Evict or downsample the least recently updated or viewed items until the memory budget is met.
+        :param keep: a item that is never evicted, usually the item just created or updated.
+        :return:
+        """
+        if cls.memory_budget is None:
+            return
+        usage = cls.memory_usage()
+        total = sum(record['cpu_bytes'] + record['gpu_bytes'] for record in usage)
+        for record in usage:
+            if total <= cls.memory_budget:
+                break
+            item = record['item']
+            if item is keep:
+                continue
+            if cls.eviction_policy == 'downsample':
+                while total > cls.memory_budget and utilites.downsample_item(item):
+                    cpu_bytes, gpu_bytes = utilites.estimate_item_bytes(item)
+                    total -= record['cpu_bytes'] + record['gpu_bytes'] - cpu_bytes - gpu_bytes
+                    record['cpu_bytes'], record['gpu_bytes'] = cpu_bytes, gpu_bytes
+                with cls.records_lock:
+                    if item in cls.records:
+                        cls.records[item].update(cpu_bytes=record['cpu_bytes'], gpu_bytes=record['gpu_bytes'])
+                if total <= cls.memory_budget:
+                    break
+            total -= record['cpu_bytes'] + record['gpu_bytes']
+            cls.forget_item(item)
+            try:
+                cls.method_delegate('removeItem', {'item': item})
+            except ValueError:
+                # already removed from the widget
+                pass
+
     @classmethod
     def get_widget(cls):
         """
@@ -295,6 +565,159 @@ class GPVisualizer(threading.Thread):
         return cls.widget
 
 
+class SensorFeed(object):
+    """
+    A pipeline stage that preprocesses point cloud frames of one sensor on a worker pool.
+
+    Reshaping, NaN filtering, color normalization and transformation of each frame run on worker threads
+    (most NumPy operations release the GIL), and finished buffers are handed to the thread of GPGLViewWidget.
+    If frames arrive faster than they can be processed or drawn, stale frames are dropped.
+    """
+    def __init__(self, item, transform=None, workers=1, drop_invalid=True):
+        """
+        :param item: pyqtgraph.opengl.GLScatterPlotItem, e.g. created by point_cloud.
+        :param transform: (4, 4) numpy array of homogeneous transformation, or a function that maps
+        (N, 3) numpy array to (N, 3) numpy array, applied to every frame.
+        :param workers: maximum number of frames of this sensor processed at the same time.
+        :param drop_invalid: If True, points with NaN or inf coordinates are dropped.
+        """
+        self.item = item
+        self.transform = transform
+        self.workers = workers
+        self.drop_invalid = drop_invalid
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.next_sequence = 0
+        self.applied_sequence = -1
+        self.in_flight = 0
+        self.pending = None
+        self.ready = None
+        self.apply_posted = False
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, pos, color=None):
+        """
+        Queue a new frame of the sensor. Does not block.
+
+        If all workers are busy, the frame waits in a single slot, replacing a older waiting frame.
+        Frames pushed after close are dropped.
+        :param pos: (H, W, 3) or (N, 3) shape of numpy array, representing 3D points
+        :param color: (H, W, 3) or (N, 3) shape of numpy array, representing RGB color
+        :return:
+        """
+        with self.lock:
+            if self.closed:
+                self.dropped += 1
+                return
+            frame = (self.next_sequence, pos, color)
+            self.next_sequence += 1
+            if self.in_flight < self.workers:
+                self.in_flight += 1
+            else:
+                if self.pending is not None:
+                    self.dropped += 1
+                self.pending = frame
+                return
+        self.submit(frame)
+
+    def submit(self, frame):
+        """
+        Submit a frame to the worker pool, for which a worker was already counted in in_flight.
+        :param frame: (sequence, pos, color)
+        :return:
+        """
+        try:
+            self.executor.submit(self.process, frame)
+        except RuntimeError:
+            # the pool was shut down by close in the meantime
+            with self.lock:
+                self.in_flight -= 1
+                self.dropped += 1
+
+    def process(self, frame):
+        """
+        Preprocess a frame on a worker thread, then hand it to the thread of GPGLViewWidget.
+        :param frame: (sequence, pos, color)
+        :return:
+        """
+        try:
+            sequence, pos, color = frame
+            pos, color = utilites.preprocess_point_cloud(pos, color, self.transform, self.drop_invalid)
+            self.deliver(sequence, pos, color)
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+        finally:
+            with self.lock:
+                frame = self.pending
+                self.pending = None
+                if frame is not None and self.closed:
+                    self.dropped += 1
+                    frame = None
+                if frame is None:
+                    self.in_flight -= 1
+            if frame is not None:
+                self.submit(frame)
+
+    def deliver(self, sequence, pos, color):
+        """
+        Keep the newest finished frame, and request it to be applied if no request is pending.
+        The frame is dropped if the event loop of GPGLViewWidget is not running.
+        :param sequence: sequence number of the frame
+        :param pos: (N, 3) numpy array of points
+        :param color: (N, C) numpy array of colors or None
+        :return:
+        """
+        with self.lock:
+            newest = self.ready[0] if self.ready is not None else self.applied_sequence
+            if sequence < newest:
+                self.dropped += 1
+                return
+            if self.ready is not None:
+                self.dropped += 1
+            self.ready = (sequence, pos, color)
+            post = not self.apply_posted
+            self.apply_posted = True
+        if post and not GPVisualizer.post_function_delegate(self.apply, wait=False):
+            # the event loop is not running, so the frame would never be applied
+            with self.lock:
+                if self.ready is not None:
+                    self.dropped += 1
+                    self.ready = None
+                self.apply_posted = False
+
+    def apply(self):
+        """
+        Update the item with the newest finished frame. Runs in the thread of GPGLViewWidget.
+        :return:
+        """
+        with self.lock:
+            frame = self.ready
+            self.ready = None
+            self.apply_posted = False
+            if frame is None:
+                return
+            self.applied_sequence = frame[0]
+        _, pos, color = frame
+        if color is not None:
+            self.item.setData(pos=pos, color=color)
+        else:
+            self.item.setData(pos=pos)
+        GPVisualizer.touch_item(self.item, enforce=False)
+
+    def close(self):
+        """
+        Stop the worker pool. Frames already being processed are still applied, the waiting frame is dropped.
+        :return:
+        """
+        with self.lock:
+            self.closed = True
+            if self.pending is not None:
+                self.dropped += 1
+                self.pending = None
+        self.executor.shutdown(wait=False)
+
+
 """
 The global variable that holds a instance of the only GPVisualizer.
 """
@@ -345,10 +768,34 @@ def is_alive():
 def update():
     """
     Update the content on the window and widget immediately.
+
+    In render on demand mode, only marks the scene dirty and requests a coalesced repaint,
+    without waiting for the widget thread.
     :return:
     """
     vis = GLPLOT_VISUALIZER_INSTANCE
-    vis.method_delegate('update')
+    if vis.widget.render_on_demand:
+        vis.widget.update()
+    else:
+        vis.method_delegate('update')
+
+
+def render_on_demand(enabled=True, frame_interval=16):
+    """
+    Enable damage tracking render mode of the GPGLViewWidget.
+
+    Changes of items, options and camera mark the scene dirty, repaint requests are coalesced
+    to at most one per frame interval, and a static scene reuses the last rendered frame.
+    :param enabled: Bool
+    :param frame_interval: minimum interval between two repaints in milliseconds.
+    :return:
+    """
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    param = {
+        'enabled': enabled,
+        'frame_interval': frame_interval
+    }
+    vis.method_delegate('set_render_on_demand', param)
 
 
 def get_widget():
@@ -376,11 +823,16 @@ def set_opts(**kwargs):
 def set_title(title):
     """
     Set title of the window.
+
+    In render on demand mode, the title is set without waiting for the widget thread.
     :param title: str
     :return:
     """
     vis = GLPLOT_VISUALIZER_INSTANCE
-    vis.method_delegate('setWindowTitle', [title])
+    if vis.widget.render_on_demand:
+        vis.post_function_delegate(vis.widget.setWindowTitle, [title])
+    else:
+        vis.method_delegate('setWindowTitle', [title])
 
 
 def remove_item(item):
@@ -394,6 +846,46 @@ def remove_item(item):
         'item': item
     }
     vis.method_delegate('removeItem', param)
+    vis.forget_item(item)
+
+
+def set_memory_budget(max_bytes, policy='evict'):
+    """
+    Set a global memory budget for all plotted items, CPU and GPU memory together.
+
+    When the budget is exceeded, the least recently updated or viewed items are removed,
+    or with policy 'downsample', scatter plot items are first downsampled by halving their points.
+    :param max_bytes: int, the budget in bytes. If None, no budget is enforced.
+    :param policy: 'evict' or 'downsample'
+    :return:
+    """
+    if policy not in ('evict', 'downsample'):
+        raise ValueError("policy must be 'evict' or 'downsample'.")
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    vis.memory_budget = max_bytes
+    vis.eviction_policy = policy
+    vis.enforce_memory_budget()
+
+
+def memory_report():
+    """
+    Print the memory used by each plotted item, least recently updated or viewed first.
+    :return: list of dict with name, item, cpu_bytes, gpu_bytes, updated and viewed time of each item.
+    """
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    usage = vis.memory_usage()
+    now = time.time()
+    print('{:<32} {:>12} {:>12} {:>10} {:>10}'.format('item', 'cpu MB', 'gpu MB', 'updated', 'viewed'))
+    for record in usage:
+        print('{:<32} {:>12.2f} {:>12.2f} {:>9.1f}s {:>9.1f}s'.format(
+            record['name'], record['cpu_bytes'] / 2.0 ** 20, record['gpu_bytes'] / 2.0 ** 20,
+            now - record['updated'], now - record['viewed']))
+    cpu_total = sum(record['cpu_bytes'] for record in usage)
+    gpu_total = sum(record['gpu_bytes'] for record in usage)
+    print('{:<32} {:>12.2f} {:>12.2f}'.format('total', cpu_total / 2.0 ** 20, gpu_total / 2.0 ** 20))
+    if vis.memory_budget is not None:
+        print('{:<32} {:>25.2f}'.format('budget', vis.memory_budget / 2.0 ** 20))
+    return usage
 
 
 def clear():
@@ -428,7 +920,7 @@ def grid_generic(size=None, color=None, antialias=True, glOptions='translucent')
     return item
 
 
-def scatter_generic(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True):
+def scatter_generic(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True, vbo=False):
     """
     Add a pyqtgraph.opengl.GLScatterPlotItem to GPGLViewWidget, with exactly the same arguments.
 
@@ -439,6 +931,9 @@ def scatter_generic(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True):
     OR a tuple of floats specifying a single color for all spots.
     :param size: (N,) array of floats specifying spot sizes or a single value to apply to all spots.
     :param pxMode: If True, spot sizes are expressed in pixels. Otherwise, they are expressed in item coordinates.
+    :param vbo: If True, creates a glplotlib.items.GLVBOScatterPlotItem instead, which keeps the data resident
+    on the GPU and only re-uploads changed ranges. If 'streaming', buffers are orphaned on each update instead,
+    for data that is replaced every frame.
     :return: pyqtgraph.opengl.GLScatterPlotItem, created in the same thread as GPGLViewWidget.
     """
     vis = GLPLOT_VISUALIZER_INSTANCE
@@ -448,7 +943,11 @@ def scatter_generic(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True):
         'size': size,
         'pxMode': pxMode
     }
-    item = vis.add_item_delegate(gl.GLScatterPlotItem, param)
+    if vbo:
+        param['streaming'] = vbo == 'streaming'
+        item = vis.add_item_delegate(items.GLVBOScatterPlotItem, param)
+    else:
+        item = vis.add_item_delegate(gl.GLScatterPlotItem, param)
     return item
 
 
@@ -491,7 +990,7 @@ def mesh_generic(meshdata,
     return item
 
 
-def line_generic(pos, color=(1, 1, 1, 1), width=0.1, antialias=True, mode='line_strip'):
+def line_generic(pos, color=(1, 1, 1, 1), width=0.1, antialias=True, mode='line_strip', lod=False, vbo=False):
     """
      Add a pyqtgraph.opengl.GLLinePlotItem to GPGLViewWidget, with exactly the same arguments.
 
@@ -504,6 +1003,11 @@ def line_generic(pos, color=(1, 1, 1, 1), width=0.1, antialias=True, mode='line_
     :param antialias: enables smooth line drawing
     :param mode: ‘lines’: Each pair of vertexes draws a single line segment.
     or ‘line_strip’: All vertexes are drawn as a continuous set of line segments.
+    :param lod: If True, creates a glplotlib.items.GLLODLinePlotItem instead, which draws very long polylines
+    with screen space level of detail. Only supported in 'line_strip' mode.
+    :param vbo: If True, creates a glplotlib.items.GLVBOLinePlotItem instead, which keeps the data resident on the GPU
+    and only re-uploads changed ranges. If 'streaming', buffers are orphaned on each update instead,
+    for data that is replaced every frame.
     :return: pyqtgraph.opengl.GLLinePlotItem, created in the same thread as GPGLViewWidget.
     """
     vis = GLPLOT_VISUALIZER_INSTANCE
@@ -514,10 +1018,30 @@ def line_generic(pos, color=(1, 1, 1, 1), width=0.1, antialias=True, mode='line_
         'antialias': antialias,
         'mode': mode
     }
-    item = vis.add_item_delegate(gl.GLLinePlotItem, param)
+    if lod:
+        if mode != 'line_strip':
+            raise ValueError("Level of detail is only supported in 'line_strip' mode.")
+        item = vis.add_item_delegate(items.GLLODLinePlotItem, param)
+    elif vbo:
+        param['streaming'] = vbo == 'streaming'
+        item = vis.add_item_delegate(items.GLVBOLinePlotItem, param)
+    else:
+        item = vis.add_item_delegate(gl.GLLinePlotItem, param)
     return item
 
 
+def append_line(item, pos, color=None):
+    """
+    Append vertices to a existing line_generic object created with lod=True, can be used for streaming data.
+    :param item: glplotlib.items.GLLODLinePlotItem
+    :param pos: (N, 3) array of floats specifying point locations.
+    :param color: (N, 4) array of floats (0.0-1.0), required if the line has per vertex colors.
+    :return:
+    """
+    item.append(pos, color=color)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
+
+
 def axis_generic(size=None, antialias=True, glOptions='translucent'):
     """
     Add a pyqtgraph.opengl.GLAxisItem to GPGLViewWidget, with exactly the same arguments.
@@ -539,7 +1063,7 @@ def axis_generic(size=None, antialias=True, glOptions='translucent'):
     return item
 
 
-def point_cloud(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True):
+def point_cloud(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True, vbo=False):
     """
     A helper function around scatter_generic to better deal with
     image shaped point cloud
@@ -547,13 +1071,16 @@ def point_cloud(pos, color=(1, 1, 1, 1), size=1.5, pxMode=True):
     :param color: (H, W, 3) or (N, 3) shape of numpy array, representing RGB color
     :param size: (N,) array of floats specifying spot sizes or a single value to apply to all spots.
     :param pxMode: If True, spot sizes are expressed in pixels. Otherwise, they are expressed in item coordinates.
+    :param vbo: If True, creates a glplotlib.items.GLVBOScatterPlotItem instead, which keeps the data resident
+    on the GPU and only re-uploads changed ranges. If 'streaming', buffers are orphaned on each update instead,
+    for data that is replaced every frame.
     :return: pyqtgraph.opengl.GLScatterPlotItem, created in the same thread as GPGLViewWidget.
     """
     if isinstance(pos, np.ndarray):
         pos = utilites.reshape_vertex_map(pos)
     if isinstance(color, np.ndarray):
         color = utilites.normalize_colors(color)
-    item = scatter_generic(pos=pos, color=color, size=size, pxMode=pxMode)
+    item = scatter_generic(pos=pos, color=color, size=size, pxMode=pxMode, vbo=vbo)
     item.setGLOptions('opaque')
     return item
 
@@ -576,9 +1103,10 @@ def update_point_cloud(item, pos=None, color=None):
         item.setData(pos=pos)
     elif color is not None:
         item.setData(color=color)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
 
 
-def edge_set(verts, edges, color=(1, 1, 1, 1), width=0.1):
+def edge_set(verts, edges, color=(1, 1, 1, 1), width=0.1, vbo=False):
     """
     A helper function for visualizing vertex-index list data structure
     :param verts: (N, 3) numpy array, representing 3D points
@@ -586,13 +1114,16 @@ def edge_set(verts, edges, color=(1, 1, 1, 1), width=0.1):
     :param color: (2*N, 4) array of floats (0.0-1.0)
     or tuple of floats specifying a single color for the entire item.
     :param width: float specifying line width
+    :param vbo: If True, creates a glplotlib.items.GLVBOLinePlotItem instead, which keeps the data resident on the GPU
+    and only re-uploads changed ranges. If 'streaming', buffers are orphaned on each update instead,
+    for data that is replaced every frame.
     :return: pyqtgraph.opengl.GLLinePlotItem, created in the same thread as GPGLViewWidget.
     """
     lines = np.empty((len(edges) * 2, 3), dtype=verts.dtype)
     lines[0::2] = verts[edges[:, 0]]
     lines[1::2] = verts[edges[:, 1]]
 
-    item = line_generic(pos=lines, color=color, width=width, mode='lines')
+    item = line_generic(pos=lines, color=color, width=width, mode='lines', vbo=vbo)
     return item
 
 
@@ -608,3 +1139,118 @@ def update_edge_set(item, verts, edges):
     lines[0::2] = verts[edges[:, 0]]
     lines[1::2] = verts[edges[:, 1]]
     item.setData(pos=lines)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
+
+
+def voxels(voxels, voxel_size=1.0, origin=(0, 0, 0), colors=(1, 1, 1, 1)):
+    """
+    Add a sparse voxel/occupancy grid, rendered as instanced cubes.
+    :param voxels: (X, Y, Z) bool numpy array of occupancy, or (N, 3) integer numpy array of voxel indices.
+    :param voxel_size: edge length of a voxel.
+    :param origin: position of the corner of voxel (0, 0, 0).
+    :param colors: (X, Y, Z, 4) or (N, 4) numpy array of floats (0.0-1.0),
+    or tuple of floats specifying a single color for all voxels.
+    :return: glplotlib.items.GLVoxelItem, created in the same thread as GPGLViewWidget.
+    """
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    param = {
+        'voxels': voxels,
+        'voxel_size': voxel_size,
+        'origin': origin,
+        'colors': colors
+    }
+    item = vis.add_item_delegate(items.GLVoxelItem, param)
+    return item
+
+
+def set_voxels(item, voxels, colors=(1, 1, 1, 1)):
+    """
+    Occupy voxels of a existing voxels object, or change their colors. Only the changed cells are uploaded.
+    :param item: glplotlib.items.GLVoxelItem
+    :param voxels: (X, Y, Z) bool numpy array of occupancy, or (N, 3) integer numpy array of voxel indices.
+    :param colors: (X, Y, Z, 4) or (N, 4) numpy array of floats (0.0-1.0),
+    or tuple of floats specifying a single color for all voxels.
+    :return:
+    """
+    item.set_voxels(voxels, colors)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
+
+
+def clear_voxels(item, voxels=None):
+    """
+    Free voxels of a existing voxels object.
+    :param item: glplotlib.items.GLVoxelItem
+    :param voxels: (X, Y, Z) bool numpy array, or (N, 3) integer numpy array of voxel indices.
+    If None, all voxels are freed.
+    :return:
+    """
+    item.clear_voxels(voxels)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
+
+
+def octree_point_cloud(path, size=1.5, pxMode=True, point_budget=1000000, resident_factor=2.0):
+    """
+    Add a point cloud streamed from a on-disk octree, for point clouds larger than memory.
+
+    The octree is created by glplotlib.octree.build_octree, or from command line by:
+    python -m glplotlib.octree input output_dir
+    Nodes are paged in and out on a background thread, based on the camera of GPGLViewWidget.
+    :param path: str, directory written by glplotlib.octree.build_octree
+    :param size: a single value specifying the spot size
+    :param pxMode: If True, spot sizes are expressed in pixels. Otherwise, they are expressed in item coordinates.
+    :param point_budget: maximum number of points drawn
+    :param resident_factor: at most resident_factor * point_budget points are kept in memory
+    :return: glplotlib.items.GLOctreePointCloudItem, created in the same thread as GPGLViewWidget.
+    """
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    param = {
+        'path': path,
+        'size': size,
+        'pxMode': pxMode,
+        'point_budget': point_budget,
+        'resident_factor': resident_factor
+    }
+    item = vis.add_item_delegate(items.GLOctreePointCloudItem, param)
+    return item
+
+
+def quiver(origins, vectors, scale=1.0, colors=(1, 1, 1, 1), width=1.0, head_size=0.2, stride=1):
+    """
+    Add a batched vector field drawn as arrows, e.g. surface normals or scene flow.
+    :param origins: (H, W, 3) or (N, 3) numpy array, start points of the arrows
+    :param vectors: (H, W, 3) or (N, 3) numpy array, directions and lengths of the arrows
+    :param scale: float, the arrows are vectors * scale long
+    :param colors: (N, 3) or (N, 4) array of floats (0.0-1.0) or 8bit integers, one color per arrow,
+    or tuple of floats specifying a single color for all arrows.
+    :param width: float specifying line width
+    :param head_size: float, length of the arrow heads relative to the arrow length
+    :param stride: only every stride-th arrow is drawn, for dense fields
+    :return: glplotlib.items.GLQuiverItem, created in the same thread as GPGLViewWidget.
+    """
+    vis = GLPLOT_VISUALIZER_INSTANCE
+    param = {
+        'origins': origins,
+        'vectors': vectors,
+        'scale': scale,
+        'colors': colors,
+        'width': width,
+        'head_size': head_size,
+        'stride': stride
+    }
+    item = vis.add_item_delegate(items.GLQuiverItem, param)
+    return item
+
+
+def update_quiver(item, origins=None, vectors=None, colors=None, scale=None):
+    """
+    Update data of a existing quiver object, can be used for animation. Arguments that are None are unchanged.
+    :param item: glplotlib.items.GLQuiverItem
+    :param origins: (H, W, 3) or (N, 3) numpy array, start points of the arrows
+    :param vectors: (H, W, 3) or (N, 3) numpy array, directions and lengths of the arrows
+    :param colors: (N, 3) or (N, 4) array of floats (0.0-1.0) or 8bit integers,
+    or tuple of floats specifying a single color.
+    :param scale: float, the arrows are vectors * scale long
+    :return:
+    """
+    item.set_vectors(origins=origins, vectors=vectors, colors=colors, scale=scale)
+    GLPLOT_VISUALIZER_INSTANCE.touch_item(item)
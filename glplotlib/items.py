@@ -0,0 +1,1300 @@
+"""Custom pyqtgraph.opengl items provided by glplotlib"""
+from pyqtgraph.Qt import QtGui
+from pyqtgraph import functions as fn
+import pyqtgraph.opengl as gl
+from pyqtgraph.opengl.GLGraphicsItem import GLGraphicsItem
+from OpenGL import GL
+from OpenGL.GL import shaders
+import numpy as np
+import collections
+import threading
+import heapq
+import weakref
+import ctypes
+
+from glplotlib import utilites
+from glplotlib import octree
+
+
+class GLLODLinePlotItem(gl.GLLinePlotItem):
+    """
+    A gl.GLLinePlotItem for very long polylines, drawn with screen space level of detail.
+
+    A multi-resolution pyramid of the polyline is built once at creation, and updated incrementally
+    by append. The polyline is split into chunks of consecutive vertices with their own bounding boxes.
+    On each paint, chunks outside the field of view are skipped, and the level of each visible chunk
+    is picked from its size on screen, so the number of vertices drawn stays proportional to the
+    screen resolution at any zoom. Only supports 'line_strip' mode.
+    """
+    def __init__(self, lod_factor=2.0, bucket_size=8, min_level_size=1024, chunk_size=65536, **kwds):
+        """
+        :param lod_factor: number of vertices drawn per pixel covered by the polyline.
+        :param bucket_size: number of vertices of a level merged into 2 vertices of the next coarser level.
+        :param min_level_size: no coarser level is built once a level has less vertices than this.
+        :param chunk_size: number of vertices per chunk, the unit of culling and level selection.
+        :param kwds: same keyword arguments as gl.GLLinePlotItem.
+        """
+        super(GLLODLinePlotItem, self).__init__(glOptions=kwds.pop('glOptions', 'additive'))
+        self.lod_factor = lod_factor
+        self.bucket_size = bucket_size
+        self.min_level_size = min_level_size
+        self.chunk_size = chunk_size
+        self.vertices = np.empty((0, 3), dtype=np.float32)
+        self.vertex_colors = None
+        self.count = 0
+        self.levels = []
+        self.level_cache = {}
+        self.chunk_low = np.empty((0, 3), dtype=np.float32)
+        self.chunk_high = np.empty((0, 3), dtype=np.float32)
+        self.setData(**kwds)
+
+    def setData(self, **kwds):
+        """
+        Same as gl.GLLinePlotItem.setData. Setting pos rebuilds the level of detail pyramid.
+        :param kwds: pos, color, width, mode, antialias
+        :return:
+        """
+        if kwds.get('mode', 'line_strip') != 'line_strip':
+            raise ValueError("GLLODLinePlotItem only supports 'line_strip' mode.")
+        pos = kwds.pop('pos', None)
+        color = kwds.pop('color', None)
+        if isinstance(color, np.ndarray):
+            self.vertex_colors = np.asarray(color, dtype=np.float32)
+            kwds['color'] = (1.0, 1.0, 1.0, 1.0)
+        elif color is not None:
+            self.vertex_colors = None
+            kwds['color'] = color
+        if pos is not None:
+            self.count = 0
+            self.levels = []
+            self.vertices = np.empty((0, 3), dtype=np.float32)
+            self.chunk_low = np.empty((0, 3), dtype=np.float32)
+            self.chunk_high = np.empty((0, 3), dtype=np.float32)
+            self.append_vertices(pos)
+        super(GLLODLinePlotItem, self).setData(**kwds)
+
+    def append(self, pos, color=None):
+        """
+        Append vertices to the end of the polyline, and update the level of detail pyramid incrementally.
+        :param pos: (N, 3) array of floats specifying point locations.
+        :param color: (N, 4) array of floats (0.0-1.0), required if the item has per vertex colors.
+        :return:
+        """
+        if self.vertex_colors is not None:
+            if color is None:
+                raise ValueError('color is required for polyline with per vertex colors.')
+            color = np.asarray(color, dtype=np.float32)
+            self.vertex_colors = utilites.append_rows(self.vertex_colors, self.count, color)
+        self.append_vertices(pos)
+        self.update()
+
+    def append_vertices(self, pos):
+        """
+        Append vertices to the full resolution level, and reduce the new complete buckets into coarser levels.
+        :param pos: (N, 3) array of floats specifying point locations.
+        :return:
+        """
+        pos = np.asarray(pos, dtype=np.float32)
+        if len(pos) == 0:
+            return
+        self.vertices = utilites.append_rows(self.vertices, self.count, pos)
+        count = self.count + len(pos)
+
+        # bounding boxes of the chunks touched by the new vertices
+        start = self.count
+        old_chunks = -(-start // self.chunk_size)
+        new_chunks = -(-count // self.chunk_size)
+        if new_chunks > old_chunks:
+            added = new_chunks - old_chunks
+            self.chunk_low = utilites.append_rows(self.chunk_low, old_chunks, np.full((added, 3), np.inf))
+            self.chunk_high = utilites.append_rows(self.chunk_high, old_chunks, np.full((added, 3), -np.inf))
+        first = start // self.chunk_size
+        offsets = np.arange(first, new_chunks) * self.chunk_size - start
+        offsets[0] = 0
+        chunks = slice(first, new_chunks)
+        self.chunk_low[chunks] = np.minimum(self.chunk_low[chunks], np.minimum.reduceat(pos, offsets, axis=0))
+        self.chunk_high[chunks] = np.maximum(self.chunk_high[chunks], np.maximum.reduceat(pos, offsets, axis=0))
+
+        # each level is [indices buffer, number of valid indices, number of finer level indices consumed]
+        finer_count = count
+        depth = 0
+        while finer_count >= self.min_level_size:
+            if depth == len(self.levels):
+                self.levels.append([np.empty((0,), dtype=np.int64), 0, 0])
+            level = self.levels[depth]
+            consumed = level[2]
+            if depth == 0:
+                pending = np.arange(consumed, finer_count, dtype=np.int64)
+            else:
+                pending = self.levels[depth - 1][0][consumed:finer_count]
+            reduced = utilites.decimate_polyline(self.vertices, pending, self.bucket_size)
+            level[0] = utilites.append_rows(level[0], level[1], reduced)
+            level[1] += len(reduced)
+            level[2] = consumed + len(pending) // self.bucket_size * self.bucket_size
+            finer_count = level[1]
+            depth += 1
+        self.count = count
+        self.level_cache = {}
+
+    def memory_usage(self):
+        """
+        Memory used by the polyline and its level of detail pyramid.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        cpu_bytes = self.vertices.nbytes + sum(level[0].nbytes for level in self.levels)
+        cpu_bytes += self.chunk_low.nbytes + self.chunk_high.nbytes
+        if self.vertex_colors is not None:
+            cpu_bytes += self.vertex_colors.nbytes
+        return cpu_bytes, 0
+
+    def level_indices(self, depth):
+        """
+        Indices of the vertices of a level, covering the whole polyline.
+
+        The vertices not yet reduced into a level, because they do not fill a complete bucket,
+        are taken from the finer levels, so the newest part of the polyline is never simplified away.
+        :param depth: index of the level, -1 for full resolution.
+        :return: (M,) increasing integer numpy array, indices into the vertices.
+        """
+        count = self.count
+        if depth < 0:
+            return np.arange(count, dtype=np.int64)
+        parts = [self.levels[depth][0][:self.levels[depth][1]]]
+        for finer in range(depth - 1, -1, -1):
+            consumed = self.levels[finer + 1][2]
+            parts.append(self.levels[finer][0][consumed:self.levels[finer][1]])
+        parts.append(np.arange(self.levels[0][2], count, dtype=np.int64))
+        return np.concatenate(parts)
+
+    def chunk_levels(self, depth, edges):
+        """
+        A level, split at the chunk edges.
+        :param depth: index of the level
+        :param edges: (K + 1,) integer numpy array, first vertex of each chunk and the vertex count
+        :return: indices of the level, and (K + 1,) positions of the chunk edges in them
+        """
+        count = self.count
+        cached = self.level_cache.get(depth)
+        if cached is None or cached[0] != count:
+            indices = self.level_indices(depth)
+            cached = (count, indices, np.searchsorted(indices, edges))
+            self.level_cache[depth] = cached
+        return cached[1], cached[2]
+
+    def select_chunks(self):
+        """
+        Pick the chunks in the field of view, and for each the coarsest level that still has
+        about lod_factor vertices per pixel covered by the chunk.
+        :return: (K + 1,) chunk edges, indices of the visible chunks, and their levels, -1 for full resolution.
+        """
+        count = self.count
+        n_chunks = -(-count // self.chunk_size)
+        edges = np.minimum(np.arange(n_chunks + 1, dtype=np.int64) * self.chunk_size, count)
+
+        view = self.view()
+        camera = self.mapFromView(view.cameraPosition())
+        target = self.mapFromView(view.opts['center'])
+        position = np.array([camera.x(), camera.y(), camera.z()], dtype=np.float64)
+        forward = np.array([target.x(), target.y(), target.z()]) - position
+        forward /= max(np.linalg.norm(forward), 1e-12)
+        width, height = max(view.width(), 1), max(view.height(), 1)
+        tan_half_fov = np.tan(np.radians(view.opts['fov']) / 2.0)
+        half_diagonal = np.arctan(tan_half_fov * np.hypot(width, height) / width)
+
+        low, high = self.chunk_low[:n_chunks], self.chunk_high[:n_chunks]
+        radius = np.linalg.norm(high - low, axis=1) / 2.0
+        offset = (low + high) / 2.0 - position
+        distance = np.maximum(np.linalg.norm(offset, axis=1), 1e-12)
+        inside = distance <= radius
+        angle = np.arccos(np.clip(offset.dot(forward) / distance, -1.0, 1.0))
+        visible = inside | (angle - np.arcsin(np.clip(radius / distance, 0.0, 1.0)) <= half_diagonal)
+        pixels = np.where(inside, np.inf, radius * width / (distance * tan_half_fov))
+        target_counts = np.maximum(self.lod_factor * pixels, 2.0)
+
+        chosen = np.full(n_chunks, -1)
+        done = np.diff(edges) <= target_counts
+        for depth in range(len(self.levels)):
+            _, boundaries = self.chunk_levels(depth, edges)
+            fits = ~done & (np.diff(boundaries) <= target_counts)
+            chosen[fits] = depth
+            done |= fits
+        chosen[~done] = len(self.levels) - 1
+        visible = np.flatnonzero(visible)
+        return edges, visible, chosen[visible]
+
+    def segment_indices(self):
+        """
+        Indices of the vertex pairs of the line segments to be drawn.
+
+        Each visible chunk is drawn at its own level, from its first vertex to the first vertex of the next chunk,
+        so neighbouring chunks connect and skipped chunks leave no spurious segment.
+        :return: (2 * S,) integer numpy array, indices into the vertices.
+        """
+        count = self.count
+        edges, chunks, depths = self.select_chunks()
+        segments = []
+        for chunk, depth in zip(chunks, depths):
+            start, stop = edges[chunk], min(edges[chunk + 1], count - 1)
+            if depth < 0:
+                run = np.arange(start, stop + 1, dtype=np.int64)
+            else:
+                indices, boundaries = self.chunk_levels(depth, edges)
+                run = np.concatenate([[start], indices[boundaries[chunk]:boundaries[chunk + 1]], [stop]])
+            segments.append(np.stack([run[:-1], run[1:]], axis=1).ravel())
+        if not segments:
+            return np.empty((0,), dtype=np.int64)
+        return np.concatenate(segments)
+
+    def paint(self):
+        if self.count < 2:
+            return
+        indices = self.segment_indices()
+        if len(indices) == 0:
+            return
+        uniform_color = self.color
+        self.pos = self.vertices[indices]
+        self.mode = 'lines'
+        if self.vertex_colors is not None:
+            self.color = self.vertex_colors[indices]
+        try:
+            super(GLLODLinePlotItem, self).paint()
+        finally:
+            self.pos = None
+            self.mode = 'line_strip'
+            self.color = uniform_color
+
+
+VOXEL_VERTEX_SHADER = """
+#version 120
+attribute vec3 voxel_index;
+attribute vec4 voxel_color;
+uniform vec3 origin;
+uniform float voxel_size;
+varying vec4 color;
+void main() {
+    vec3 position = origin + (voxel_index + gl_Vertex.xyz) * voxel_size;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(position, 1.0);
+    float shade = 0.6 + 0.4 * abs(dot(gl_Normal, normalize(vec3(0.3, 0.5, 0.8))));
+    color = vec4(voxel_color.rgb * shade, voxel_color.a);
+}
+"""
+
+VOXEL_FRAGMENT_SHADER = """
+#version 120
+varying vec4 color;
+void main() {
+    gl_FragColor = color;
+}
+"""
+
+
+def unit_cube_triangles():
+    """
+    Triangles of the unit cube [0, 1]^3 with per face normals.
+    :return: (36, 6) float32 numpy array, each row is a vertex followed by its normal.
+    """
+    rows = []
+    for axis in range(3):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+        for side in (0.0, 1.0):
+            corners = np.zeros((4, 3), dtype=np.float32)
+            corners[:, axis] = side
+            corners[:, u] = (0, 1, 1, 0)
+            corners[:, v] = (0, 0, 1, 1)
+            normal = np.zeros(3, dtype=np.float32)
+            normal[axis] = 1.0 if side else -1.0
+            for corner in (0, 1, 2, 0, 2, 3):
+                rows.append(np.concatenate([corners[corner], normal]))
+    return np.array(rows, dtype=np.float32)
+
+
+class VoxelSlotIndex(object):
+    """
+    Map from packed voxel indices to slots, with vectorized lookups by np.searchsorted.
+
+    Keys are kept in a large sorted array and a small sorted array of recent inserts. Removed keys of the
+    large array are marked with slot -1 instead of being deleted. The small array is merged into the large
+    one once it holds more than a few times the square root of its size, and the marks are compacted once
+    they are half of it, so the cost of a update is amortized over the changed voxels, not the whole grid.
+    """
+    def __init__(self, min_merge_size=4096):
+        """
+        :param min_merge_size: the recent inserts are never merged before there are this many
+        """
+        self.min_merge_size = min_merge_size
+        self.keys = np.empty((0,), dtype=np.int64)
+        self.slots = np.empty((0,), dtype=np.int64)
+        self.removed = 0
+        self.recent_keys = np.empty((0,), dtype=np.int64)
+        self.recent_slots = np.empty((0,), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys) - self.removed + len(self.recent_keys)
+
+    @staticmethod
+    def search(sorted_keys, keys):
+        """
+        :param sorted_keys: (M,) sorted int64 numpy array
+        :param keys: (N,) int64 numpy array
+        :return: (N,) numpy array of positions in sorted_keys, and (N,) bool numpy array, True where the key exists
+        """
+        positions = np.searchsorted(sorted_keys, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        inside = positions < len(sorted_keys)
+        found[inside] = sorted_keys[positions[inside]] == keys[inside]
+        return positions, found
+
+    def lookup(self, keys):
+        """
+        :param keys: (N,) int64 numpy array of packed voxel indices
+        :return: (N,) int64 numpy array of slots, -1 where the key is not held
+        """
+        slots = np.full(len(keys), -1, dtype=np.int64)
+        positions, found = self.search(self.keys, keys)
+        slots[found] = self.slots[positions[found]]
+        positions, found = self.search(self.recent_keys, keys)
+        slots[found] = self.recent_slots[positions[found]]
+        return slots
+
+    def assign(self, keys, slots):
+        """
+        Change the slots of keys that are held.
+        :param keys: (N,) int64 numpy array of packed voxel indices
+        :param slots: (N,) int64 numpy array of new slots
+        :return:
+        """
+        positions, found = self.search(self.keys, keys)
+        self.slots[positions[found]] = slots[found]
+        positions, found = self.search(self.recent_keys, keys)
+        self.recent_slots[positions[found]] = slots[found]
+
+    def insert(self, keys, slots):
+        """
+        Add keys that are not held.
+        :param keys: (N,) sorted and unique int64 numpy array of packed voxel indices
+        :param slots: (N,) int64 numpy array of their slots
+        :return:
+        """
+        # keys removed from the large array are revived in place
+        positions, found = self.search(self.keys, keys)
+        self.slots[positions[found]] = slots[found]
+        self.removed -= int(found.sum())
+        keys, slots = keys[~found], slots[~found]
+        positions = np.searchsorted(self.recent_keys, keys)
+        self.recent_keys = np.insert(self.recent_keys, positions, keys)
+        self.recent_slots = np.insert(self.recent_slots, positions, slots)
+        if len(self.recent_keys) > max(self.min_merge_size, 4 * int(np.sqrt(len(self.keys)))):
+            self.merge()
+
+    def remove(self, keys):
+        """
+        Remove keys that are held.
+        :param keys: (N,) sorted and unique int64 numpy array of packed voxel indices
+        :return:
+        """
+        positions, found = self.search(self.keys, keys)
+        self.slots[positions[found]] = -1
+        self.removed += int(found.sum())
+        positions, found = self.search(self.recent_keys, keys)
+        self.recent_keys = np.delete(self.recent_keys, positions[found])
+        self.recent_slots = np.delete(self.recent_slots, positions[found])
+        if self.removed > max(self.min_merge_size, len(self.keys) // 2):
+            self.merge()
+
+    def merge(self):
+        """
+        Merge the recent inserts into the large array and drop the removed keys.
+        :return:
+        """
+        held = self.slots >= 0
+        keys, slots = self.keys[held], self.slots[held]
+        positions = np.searchsorted(keys, self.recent_keys) + np.arange(len(self.recent_keys))
+        recent = np.zeros(len(keys) + len(self.recent_keys), dtype=bool)
+        recent[positions] = True
+        self.keys = np.empty(len(recent), dtype=np.int64)
+        self.slots = np.empty(len(recent), dtype=np.int64)
+        self.keys[recent], self.keys[~recent] = self.recent_keys, keys
+        self.slots[recent], self.slots[~recent] = self.recent_slots, slots
+        self.removed = 0
+        self.recent_keys = self.recent_keys[:0]
+        self.recent_slots = self.recent_slots[:0]
+
+    def clear(self):
+        """
+        Remove all keys.
+        :return:
+        """
+        self.__init__(self.min_merge_size)
+
+    def memory_usage(self):
+        """
+        :return: bytes used by the arrays
+        """
+        return self.keys.nbytes + self.slots.nbytes + self.recent_keys.nbytes + self.recent_slots.nbytes
+
+
+class GLVoxelItem(GLGraphicsItem):
+    """
+    Draws a sparse voxel/occupancy grid as instanced cubes.
+
+    Voxels are stored compactly as a list of integer indices and colors, with a VoxelSlotIndex from packed
+    voxel indices to slots. set_voxels and clear_voxels only touch the changed
+    cells, and only runs of dirty slots are uploaded to the GPU on the next paint.
+    Requires OpenGL 3.3 or ARB_instanced_arrays.
+    """
+    def __init__(self, voxels=None, voxel_size=1.0, origin=(0, 0, 0), colors=(1, 1, 1, 1), glOptions='opaque'):
+        """
+        :param voxels: (X, Y, Z) bool numpy array, or (N, 3) integer numpy array of voxel indices.
+        :param voxel_size: edge length of a voxel.
+        :param origin: position of the corner of voxel (0, 0, 0).
+        :param colors: (X, Y, Z, 4) or (N, 4) numpy array, or tuple of floats specifying a single color.
+        :param glOptions: str
+        """
+        super(GLVoxelItem, self).__init__()
+        self.setGLOptions(glOptions)
+        self.voxel_size = voxel_size
+        self.origin = tuple(origin)
+        self.indices = np.empty((0, 3), dtype=np.int32)
+        self.colors = np.empty((0, 4), dtype=np.float32)
+        self.keys = np.empty((0,), dtype=np.int64)
+        self.count = 0
+        self.index = VoxelSlotIndex()
+        self.dirty_starts = []
+        self.dirty_stops = []
+        self.program = None
+        self.cube_buffer = None
+        self.index_buffer = None
+        self.color_buffer = None
+        self.gpu_capacity = 0
+        if voxels is not None:
+            self.set_voxels(voxels, colors)
+
+    def set_voxels(self, voxels, colors=(1, 1, 1, 1)):
+        """
+        Occupy voxels, or change the colors of voxels already occupied.
+        :param voxels: (X, Y, Z) bool numpy array, or (N, 3) integer numpy array of voxel indices,
+        each in [-2**20, 2**20), otherwise ValueError is raised.
+        :param colors: (X, Y, Z, 4) or (N, 4) numpy array, or tuple of floats specifying a single color.
+        :return:
+        """
+        indices, colors = utilites.sparse_voxels(voxels, colors)
+        keys = utilites.pack_voxel_keys(indices)
+        keys, first = np.unique(keys[::-1], return_index=True)
+        last = len(indices) - 1 - first
+        indices, colors = indices[last], colors[last]
+
+        slots = self.index.lookup(keys)
+        existing = slots >= 0
+        slots = slots[existing]
+        if len(slots):
+            self.colors[slots] = colors[existing]
+            self.mark_dirty(slots, slots + 1)
+
+        added = ~existing
+        n_added = int(added.sum())
+        if n_added:
+            start = self.count
+            self.indices = utilites.append_rows(self.indices, start, indices[added])
+            self.colors = utilites.append_rows(self.colors, start, colors[added])
+            self.keys = utilites.append_rows(self.keys, start, keys[added])
+            self.index.insert(keys[added], np.arange(start, start + n_added))
+            self.count = start + n_added
+            self.mark_dirty(start, self.count)
+        self.update()
+
+    def clear_voxels(self, voxels=None):
+        """
+        Free voxels. The freed slots are filled with the last voxels.
+        :param voxels: (X, Y, Z) bool numpy array, or (N, 3) integer numpy array of voxel indices,
+        each in [-2**20, 2**20), otherwise ValueError is raised.
+        If None, all voxels are freed.
+        :return:
+        """
+        if voxels is None:
+            self.index.clear()
+            self.count = 0
+            self.dirty_starts = []
+            self.dirty_stops = []
+            self.update()
+            return
+
+        indices, _ = utilites.sparse_voxels(voxels)
+        keys = np.unique(utilites.pack_voxel_keys(indices))
+        removed = self.index.lookup(keys)
+        found = removed >= 0
+        removed = removed[found]
+        if len(removed) == 0:
+            return
+        self.index.remove(keys[found])
+
+        # the voxels behind the new end fill the freed slots before it
+        count = self.count - len(removed)
+        holes = np.sort(removed[removed < count])
+        tail = np.ones(self.count - count, dtype=bool)
+        tail[removed[removed >= count] - count] = False
+        tail = np.flatnonzero(tail) + count
+        self.count = count
+        if len(holes):
+            self.indices[holes] = self.indices[tail]
+            self.colors[holes] = self.colors[tail]
+            self.keys[holes] = self.keys[tail]
+            self.index.assign(self.keys[holes], holes)
+            self.mark_dirty(holes, holes + 1)
+        self.update()
+
+    def set_transform(self, voxel_size=None, origin=None):
+        """
+        Change voxel size or origin, without uploading any voxel.
+        :param voxel_size: edge length of a voxel.
+        :param origin: position of the corner of voxel (0, 0, 0).
+        :return:
+        """
+        if voxel_size is not None:
+            self.voxel_size = voxel_size
+        if origin is not None:
+            self.origin = tuple(origin)
+        self.update()
+
+    def memory_usage(self):
+        """
+        Memory used by the voxel storage and the instance buffers.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        cpu_bytes = self.indices.nbytes + self.colors.nbytes + self.keys.nbytes
+        cpu_bytes += self.index.memory_usage()
+        gpu_bytes = self.gpu_capacity * (12 + 16)
+        return cpu_bytes, gpu_bytes
+
+    def free(self):
+        """
+        Delete the shader program and buffers. Must be called with the GL context current.
+        Called by GPGLViewWidget when the item is removed.
+        :return:
+        """
+        if self.program is not None:
+            GL.glDeleteBuffers(3, [self.cube_buffer, self.index_buffer, self.color_buffer])
+            GL.glDeleteProgram(self.program)
+        self.program = None
+        self.cube_buffer = None
+        self.index_buffer = None
+        self.color_buffer = None
+        self.gpu_capacity = 0
+        self.mark_dirty(0, self.count)
+
+    def mark_dirty(self, start, stop):
+        """
+        Add ranges of slots to be uploaded on the next paint.
+        :param start: first dirty slot, or integer numpy array of first slots of several ranges
+        :param stop: one after the last dirty slot, or integer numpy array of the same shape
+        :return:
+        """
+        self.dirty_starts.append(np.atleast_1d(start))
+        self.dirty_stops.append(np.atleast_1d(stop))
+        if len(self.dirty_starts) > 64:
+            # keep the pending ranges compact between paints
+            runs = utilites.merge_runs(np.concatenate(self.dirty_starts), np.concatenate(self.dirty_stops))
+            self.dirty_starts = [np.array([start for start, _ in runs], dtype=np.int64)]
+            self.dirty_stops = [np.array([stop for _, stop in runs], dtype=np.int64)]
+
+    def initializeGL(self):
+        if self.program is not None:
+            return
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VOXEL_VERTEX_SHADER, GL.GL_VERTEX_SHADER),
+            shaders.compileShader(VOXEL_FRAGMENT_SHADER, GL.GL_FRAGMENT_SHADER))
+        self.cube_buffer, self.index_buffer, self.color_buffer = GL.glGenBuffers(3)
+        cube = unit_cube_triangles()
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.cube_buffer)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, cube.nbytes, cube, GL.GL_STATIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    def upload(self):
+        """
+        Upload the dirty slot ranges to the instance buffers, merged into a few runs,
+        reallocating the buffers if they are too small. Must be called with the GL context current.
+        :return:
+        """
+        count = self.count
+        if count > self.gpu_capacity:
+            self.gpu_capacity = len(self.indices)
+            for buffer, row_bytes in ((self.index_buffer, 12), (self.color_buffer, 16)):
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+                GL.glBufferData(GL.GL_ARRAY_BUFFER, self.gpu_capacity * row_bytes, None, GL.GL_DYNAMIC_DRAW)
+            self.dirty_starts = [np.zeros(1, dtype=np.int64)]
+            self.dirty_stops = [np.full(1, count, dtype=np.int64)]
+        if self.dirty_starts:
+            runs = utilites.merge_runs(np.concatenate(self.dirty_starts),
+                                       np.minimum(np.concatenate(self.dirty_stops), count))
+            self.dirty_starts = []
+            self.dirty_stops = []
+            for start, stop in runs:
+                indices = np.ascontiguousarray(self.indices[start:stop], dtype=np.float32)
+                colors = np.ascontiguousarray(self.colors[start:stop])
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.index_buffer)
+                GL.glBufferSubData(GL.GL_ARRAY_BUFFER, start * 12, indices.nbytes, indices)
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.color_buffer)
+                GL.glBufferSubData(GL.GL_ARRAY_BUFFER, start * 16, colors.nbytes, colors)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    def paint(self):
+        if self.program is None:
+            self.initializeGL()
+        self.upload()
+        count = self.count
+        if count == 0:
+            return
+        self.setupGLState()
+
+        index_location = GL.glGetAttribLocation(self.program, 'voxel_index')
+        color_location = GL.glGetAttribLocation(self.program, 'voxel_color')
+        GL.glUseProgram(self.program)
+        try:
+            GL.glUniform3f(GL.glGetUniformLocation(self.program, 'origin'), *self.origin)
+            GL.glUniform1f(GL.glGetUniformLocation(self.program, 'voxel_size'), self.voxel_size)
+
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.cube_buffer)
+            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+            GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+            GL.glVertexPointer(3, GL.GL_FLOAT, 24, ctypes.c_void_p(0))
+            GL.glNormalPointer(GL.GL_FLOAT, 24, ctypes.c_void_p(12))
+
+            for location, buffer, size in ((index_location, self.index_buffer, 3),
+                                           (color_location, self.color_buffer, 4)):
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+                GL.glEnableVertexAttribArray(location)
+                GL.glVertexAttribPointer(location, size, GL.GL_FLOAT, GL.GL_FALSE, 0, ctypes.c_void_p(0))
+                GL.glVertexAttribDivisor(location, 1)
+
+            GL.glDrawArraysInstanced(GL.GL_TRIANGLES, 0, 36, count)
+        finally:
+            for location in (index_location, color_location):
+                GL.glVertexAttribDivisor(location, 0)
+                GL.glDisableVertexAttribArray(location)
+            GL.glDisableClientState(GL.GL_NORMAL_ARRAY)
+            GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+            GL.glUseProgram(0)
+
+
+class VertexBuffer(object):
+    """
+    A OpenGL array buffer mirroring a float32 numpy array.
+
+    The data is uploaded once, and on later changes only the rows that differ are re-uploaded, merged into
+    a few runs. In streaming mode, full updates orphan the buffer storage instead, so the upload does not stall
+    while the GPU still draws from the previous data. The data may be replaced from any thread,
+    data and dirty ranges are swapped together under a lock.
+    """
+    def __init__(self, streaming=False):
+        """
+        :param streaming: If True, every update is treated as a full update uploaded to orphaned storage.
+        """
+        self.streaming = streaming
+        self.data = None
+        self.buffer_id = None
+        self.capacity = 0
+        self.dirty_starts = []
+        self.dirty_stops = []
+        self.lock = threading.Lock()
+
+    def set(self, data):
+        """
+        Replace the data, marking only the changed rows dirty.
+        :param data: (N, C) numpy array, a float32 copy is kept.
+        :return:
+        """
+        data = np.array(data, dtype=np.float32)
+        with self.lock:
+            previous = self.data
+            self.data = data
+            if self.streaming or previous is None or data.shape != previous.shape:
+                self.mark_dirty(0, len(data))
+            else:
+                rows = utilites.changed_rows(previous, data)
+                if len(rows):
+                    self.mark_dirty(rows, rows + 1)
+
+    def set_range(self, start, values):
+        """
+        Overwrite rows of the data, starting at row start.
+        :param start: first row to be overwritten
+        :param values: (M, C) numpy array
+        :return:
+        """
+        with self.lock:
+            self.data[start:start + len(values)] = values
+            self.mark_dirty(start, start + len(values))
+
+    def mark_dirty(self, start, stop):
+        """
+        Add ranges of rows to be uploaded on the next bind. The caller holds the lock.
+        :param start: first dirty row, or integer numpy array of first rows of several ranges
+        :param stop: one after the last dirty row, or integer numpy array of the same shape
+        :return:
+        """
+        self.dirty_starts.append(np.atleast_1d(start))
+        self.dirty_stops.append(np.atleast_1d(stop))
+        if len(self.dirty_starts) > 64:
+            # keep the pending ranges compact between binds
+            runs = utilites.merge_runs(np.concatenate(self.dirty_starts), np.concatenate(self.dirty_stops))
+            self.dirty_starts = [np.array([start for start, _ in runs], dtype=np.int64)]
+            self.dirty_stops = [np.array([stop for _, stop in runs], dtype=np.int64)]
+
+    def bind(self):
+        """
+        Bind the buffer to GL_ARRAY_BUFFER, uploading dirty rows first. Must be called with the GL context current.
+        :return: the data now in the buffer, the number of rows to be drawn must be taken from it.
+        """
+        with self.lock:
+            data = self.data
+            runs = []
+            if self.dirty_starts:
+                runs = utilites.merge_runs(np.concatenate(self.dirty_starts),
+                                           np.minimum(np.concatenate(self.dirty_stops), len(data)))
+            self.dirty_starts = []
+            self.dirty_stops = []
+        if self.buffer_id is None:
+            self.buffer_id = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.buffer_id)
+        usage = GL.GL_STREAM_DRAW if self.streaming else GL.GL_STATIC_DRAW
+        if data.nbytes > self.capacity:
+            self.capacity = data.nbytes
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, self.capacity, data, usage)
+        else:
+            if self.streaming and runs == [(0, len(data))]:
+                GL.glBufferData(GL.GL_ARRAY_BUFFER, self.capacity, None, usage)
+            for start, stop in runs:
+                rows = data[start:stop]
+                GL.glBufferSubData(GL.GL_ARRAY_BUFFER, rows.strides[0] * start, rows.nbytes, rows)
+        return data
+
+    def free(self):
+        """
+        Delete the buffer. Must be called with the GL context current.
+        :return:
+        """
+        if self.buffer_id is not None:
+            GL.glDeleteBuffers(1, [self.buffer_id])
+        self.buffer_id = None
+        self.capacity = 0
+
+    def memory_usage(self):
+        """
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        return (0 if self.data is None else self.data.nbytes), self.capacity
+
+
+class GLVBOScatterPlotItem(gl.GLScatterPlotItem):
+    """
+    A gl.GLScatterPlotItem whose positions and colors are resident on the GPU.
+
+    Positions, per point colors and per point sizes in pxMode are uploaded once,
+    and setData only re-uploads the changed points.
+    """
+    def __init__(self, streaming=False, **kwds):
+        """
+        :param streaming: If True, buffers are orphaned on each update, for data replaced every frame.
+        :param kwds: same keyword arguments as gl.GLScatterPlotItem.
+        """
+        super(GLVBOScatterPlotItem, self).__init__(glOptions=kwds.pop('glOptions', 'additive'))
+        self.pos_buffer = VertexBuffer(streaming)
+        self.color_buffer = VertexBuffer(streaming)
+        # the vertex shader reads the point size from norm.x, so sizes are stored as (N, 3) normals
+        self.size_buffer = VertexBuffer(streaming)
+        self.setData(**kwds)
+
+    def setData(self, **kwds):
+        """
+        Same as gl.GLScatterPlotItem.setData.
+        :param kwds: pos, color, size, pxMode
+        :return:
+        """
+        if 'pos' in kwds:
+            self.pos_buffer.set(kwds['pos'])
+            kwds['pos'] = self.pos_buffer.data
+        if isinstance(kwds.get('color'), np.ndarray):
+            self.color_buffer.set(kwds['color'])
+            kwds['color'] = self.color_buffer.data
+        if isinstance(kwds.get('size'), np.ndarray):
+            norm = np.zeros((len(kwds['size']), 3), dtype=np.float32)
+            norm[:, 0] = kwds['size']
+            self.size_buffer.set(norm)
+        super(GLVBOScatterPlotItem, self).setData(**kwds)
+
+    def free(self):
+        """
+        Delete the GPU buffers. Must be called with the GL context current.
+        Called by GPGLViewWidget when the item is removed.
+        :return:
+        """
+        self.pos_buffer.free()
+        self.color_buffer.free()
+        self.size_buffer.free()
+
+    def memory_usage(self):
+        """
+        Memory used by the CPU copies and the GPU buffers.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        usage = [self.pos_buffer.memory_usage()]
+        if isinstance(self.color, np.ndarray):
+            usage.append(self.color_buffer.memory_usage())
+        if isinstance(self.size, np.ndarray):
+            usage.append(self.size_buffer.memory_usage())
+        return sum(cpu for cpu, _ in usage), sum(gpu for _, gpu in usage)
+
+    def paint(self):
+        if not isinstance(self.pos, np.ndarray) or len(self.pos) == 0:
+            return
+        self.setupGLState()
+
+        GL.glEnable(GL.GL_POINT_SPRITE)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        GL.glEnable(GL.GL_TEXTURE_2D)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.pointTexture)
+        GL.glTexEnvi(GL.GL_POINT_SPRITE, GL.GL_COORD_REPLACE, GL.GL_TRUE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glEnable(GL.GL_PROGRAM_POINT_SIZE)
+
+        with self.shader:
+            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+            try:
+                pos = self.pos_buffer.bind()
+                GL.glVertexPointer(3, GL.GL_FLOAT, 0, ctypes.c_void_p(0))
+
+                if isinstance(self.color, np.ndarray):
+                    GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+                    color = self.color_buffer.bind()
+                    GL.glColorPointer(color.shape[-1], GL.GL_FLOAT, 0, ctypes.c_void_p(0))
+                    pos = pos[:len(color)]
+                elif isinstance(self.color, QtGui.QColor):
+                    GL.glColor4f(*fn.glColor(self.color))
+                else:
+                    GL.glColor4f(*self.color)
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+                # the vertex shader uses norm.x as point size
+                if self.pxMode and isinstance(self.size, np.ndarray):
+                    GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+                    norm = self.size_buffer.bind()
+                    GL.glNormalPointer(GL.GL_FLOAT, 0, ctypes.c_void_p(0))
+                    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+                    pos = pos[:len(norm)]
+                elif not self.pxMode:
+                    # the size in pixels depends on the camera, so it is computed on every paint
+                    GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+                    norm = np.empty(pos.shape, dtype=np.float32)
+                    gpos = self.mapToView(pos.transpose()).transpose()
+                    norm[..., 0] = self.size / self.view().pixelSize(gpos)
+                    GL.glNormalPointerf(norm)
+                else:
+                    GL.glNormal3f(self.size, 0, 0)
+                GL.glDrawArrays(GL.GL_POINTS, 0, len(pos))
+            finally:
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+                GL.glDisableClientState(GL.GL_NORMAL_ARRAY)
+                GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+                GL.glDisableClientState(GL.GL_COLOR_ARRAY)
+
+
+class GLVBOLinePlotItem(gl.GLLinePlotItem):
+    """
+    A gl.GLLinePlotItem whose vertexes and colors are resident on the GPU.
+
+    Vertexes and per vertex colors are uploaded once, and setData only re-uploads the changed vertexes.
+    """
+    def __init__(self, streaming=False, **kwds):
+        """
+        :param streaming: If True, buffers are orphaned on each update, for data replaced every frame.
+        :param kwds: same keyword arguments as gl.GLLinePlotItem.
+        """
+        super(GLVBOLinePlotItem, self).__init__(glOptions=kwds.pop('glOptions', 'additive'))
+        self.pos_buffer = VertexBuffer(streaming)
+        self.color_buffer = VertexBuffer(streaming)
+        self.setData(**kwds)
+
+    def setData(self, **kwds):
+        """
+        Same as gl.GLLinePlotItem.setData.
+        :param kwds: pos, color, width, mode, antialias
+        :return:
+        """
+        if 'pos' in kwds:
+            self.pos_buffer.set(kwds['pos'])
+            kwds['pos'] = self.pos_buffer.data
+        if isinstance(kwds.get('color'), np.ndarray):
+            self.color_buffer.set(kwds['color'])
+            kwds['color'] = self.color_buffer.data
+        super(GLVBOLinePlotItem, self).setData(**kwds)
+
+    def free(self):
+        """
+        Delete the GPU buffers. Must be called with the GL context current.
+        Called by GPGLViewWidget when the item is removed.
+        :return:
+        """
+        self.pos_buffer.free()
+        self.color_buffer.free()
+
+    def memory_usage(self):
+        """
+        Memory used by the CPU copies and the GPU buffers.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        usage = [self.pos_buffer.memory_usage()]
+        if isinstance(self.color, np.ndarray):
+            usage.append(self.color_buffer.memory_usage())
+        return sum(cpu for cpu, _ in usage), sum(gpu for _, gpu in usage)
+
+    def paint(self):
+        if self.pos is None or len(self.pos) == 0:
+            return
+        self.setupGLState()
+
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        try:
+            count = len(self.pos_buffer.bind())
+            GL.glVertexPointer(3, GL.GL_FLOAT, 0, ctypes.c_void_p(0))
+
+            if isinstance(self.color, np.ndarray):
+                GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+                color = self.color_buffer.bind()
+                GL.glColorPointer(color.shape[-1], GL.GL_FLOAT, 0, ctypes.c_void_p(0))
+                count = min(count, len(color))
+            elif isinstance(self.color, QtGui.QColor):
+                GL.glColor4f(*fn.glColor(self.color))
+            else:
+                GL.glColor4f(*self.color)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+            GL.glLineWidth(self.width)
+
+            if self.antialias:
+                GL.glEnable(GL.GL_LINE_SMOOTH)
+                GL.glEnable(GL.GL_BLEND)
+                GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+                GL.glHint(GL.GL_LINE_SMOOTH_HINT, GL.GL_NICEST)
+
+            if self.mode == 'line_strip':
+                GL.glDrawArrays(GL.GL_LINE_STRIP, 0, count)
+            elif self.mode == 'lines':
+                GL.glDrawArrays(GL.GL_LINES, 0, count)
+            else:
+                raise ValueError("Unknown line mode '%s'. (must be 'lines' or 'line_strip')" % self.mode)
+        finally:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+            GL.glDisableClientState(GL.GL_COLOR_ARRAY)
+            GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
+
+class GLOctreePointCloudItem(gl.GLScatterPlotItem):
+    """
+    A gl.GLScatterPlotItem that streams a point cloud from a on-disk octree written by octree.build_octree.
+
+    On each paint, the camera of the view is recorded. A background thread then selects the nodes that are
+    inside the field of view and large enough on screen, largest first, up to a point budget. It pages them
+    into a cache of resident nodes, bounded to a multiple of the point budget by evicting the least recently
+    used ones, and hands the points to the render thread. Navigation stays interactive while only the
+    visible detail is loaded.
+    """
+    def __init__(self, path, point_budget=1000000, resident_factor=2.0, min_node_pixels=32.0,
+                 size=1.5, pxMode=True, glOptions='opaque'):
+        """
+        :param path: str, directory written by octree.build_octree, or a octree.Octree
+        :param point_budget: maximum number of points drawn
+        :param resident_factor: at most resident_factor * point_budget points are kept in memory
+        :param min_node_pixels: nodes whose projected size is smaller than this are not loaded
+        :param size: a single value specifying the spot size
+        :param pxMode: If True, spot sizes are expressed in pixels. Otherwise, they are expressed in item coordinates.
+        :param glOptions: str
+        """
+        super(GLOctreePointCloudItem, self).__init__(glOptions=glOptions)
+        self.setData(size=size, pxMode=pxMode)
+        self.octree = path if isinstance(path, octree.Octree) else octree.Octree(path)
+        self.point_budget = point_budget
+        self.max_resident_points = int(max(resident_factor, 1.0) * point_budget)
+        self.min_node_pixels = min_node_pixels
+        self.resident = collections.OrderedDict()
+        self.resident_points = 0
+        self.resident_lock = threading.Lock()
+        self.display = (np.empty((0, 3), dtype=np.float32), np.empty((0, 4), dtype=np.float32))
+        self.camera = None
+        self.camera_event = threading.Event()
+        self.stopped = False
+        # the thread only holds a weak reference, and is woken up to exit when the item is collected
+        self.pager = threading.Thread(target=GLOctreePointCloudItem.page_loop,
+                                      args=(weakref.ref(self), self.camera_event))
+        self.pager.daemon = True
+        self.pager.start()
+        weakref.finalize(self, self.camera_event.set)
+
+    def close(self):
+        """
+        Stop the paging thread.
+        :return:
+        """
+        self.stopped = True
+        self.camera_event.set()
+
+    def free(self):
+        """
+        Stop the paging thread and release the resident nodes.
+        Called by GPGLViewWidget when the item is removed.
+        :return:
+        """
+        self.close()
+        with self.resident_lock:
+            self.resident.clear()
+            self.resident_points = 0
+        self.display = (np.empty((0, 3), dtype=np.float32), np.empty((0, 4), dtype=np.float32))
+
+    def memory_usage(self):
+        """
+        Memory used by the resident nodes and the points drawn.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        with self.resident_lock:
+            cpu_bytes = sum(pos.nbytes + colors.nbytes for pos, colors in self.resident.values())
+        pos, colors = self.display
+        return cpu_bytes + pos.nbytes + colors.nbytes, 0
+
+    def record_camera(self):
+        """
+        Record the camera of the view in item coordinates, and wake up the paging thread if it moved.
+        :return:
+        """
+        view = self.view()
+        if view is None:
+            return
+        position = self.mapFromView(view.cameraPosition())
+        target = self.mapFromView(view.opts['center'])
+        camera = (position.x(), position.y(), position.z(), target.x(), target.y(), target.z(),
+                  view.opts['fov'], view.width(), view.height())
+        if camera != self.camera:
+            self.camera = camera
+            self.camera_event.set()
+
+    def select_nodes(self, camera):
+        """
+        Select the nodes to be drawn for a camera, largest projected size first.
+        :param camera: tuple recorded by record_camera
+        :return: list of node names
+        """
+        position = np.array(camera[0:3], dtype=np.float64)
+        forward = np.array(camera[3:6]) - position
+        forward /= max(np.linalg.norm(forward), 1e-12)
+        fov, width, height = camera[6:9]
+        tan_half_fov = np.tan(np.radians(fov) / 2.0)
+        # cone around the view direction that contains the whole viewport
+        half_diagonal = np.arctan(tan_half_fov * np.hypot(width, height) / max(width, 1))
+
+        selected = []
+        points = 0
+        candidates = [(-np.inf, 'r')]
+        while candidates:
+            _, name = heapq.heappop(candidates)
+            count = self.octree.counts[name]
+            if points + count > self.point_budget:
+                continue
+            selected.append(name)
+            points += count
+            for child in self.octree.children(name):
+                center, half_size = self.octree.bounds(child)
+                radius = half_size * np.sqrt(3.0)
+                offset = center - position
+                distance = np.linalg.norm(offset)
+                if distance > radius:
+                    angle = np.arccos(np.clip(offset.dot(forward) / distance, -1.0, 1.0))
+                    if angle - np.arcsin(radius / distance) > half_diagonal:
+                        continue
+                    pixels = radius / (distance * tan_half_fov) * width / 2.0
+                    if pixels < self.min_node_pixels:
+                        continue
+                else:
+                    pixels = np.inf
+                heapq.heappush(candidates, (-pixels, child))
+        return selected
+
+    @staticmethod
+    def page_loop(item_ref, camera_event):
+        """
+        Procedure of the paging thread.
+        :param item_ref: weakref.ref to the item
+        :param camera_event: threading.Event, set when the camera moved or the item is closed
+        :return:
+        """
+        while True:
+            camera_event.wait()
+            camera_event.clear()
+            item = item_ref()
+            if item is None or item.stopped:
+                return
+            item.page(item.camera)
+            del item
+
+    def page(self, camera):
+        """
+        Page in the nodes selected for a camera and hand their points to the render thread.
+        :param camera: tuple recorded by record_camera
+        :return:
+        """
+        selected = self.select_nodes(camera)
+        for name in selected:
+            # restart as soon as the camera moves again
+            if self.camera_event.is_set():
+                break
+            with self.resident_lock:
+                loaded = name in self.resident
+                if loaded:
+                    self.resident.move_to_end(name)
+            if not loaded:
+                data = self.octree.load(name)
+                with self.resident_lock:
+                    if self.stopped:
+                        return
+                    self.resident[name] = data
+                    self.resident_points += len(data[0])
+                    # the selected nodes are the most recently used, and fit in the point budget
+                    while self.resident_points > self.max_resident_points:
+                        _, (pos, _) = self.resident.popitem(last=False)
+                        self.resident_points -= len(pos)
+        with self.resident_lock:
+            nodes = [self.resident[name] for name in selected if name in self.resident]
+        if nodes and not self.stopped:
+            self.display = (np.concatenate([pos for pos, _ in nodes]),
+                            np.concatenate([colors for _, colors in nodes]))
+            self.update()
+
+    def paint(self):
+        self.record_camera()
+        pos, colors = self.display
+        if len(pos) == 0:
+            return
+        self.pos = pos
+        self.color = colors if self.octree.has_colors else (1.0, 1.0, 1.0, 1.0)
+        super(GLOctreePointCloudItem, self).paint()
+
+
+class GLQuiverItem(gl.GLLinePlotItem):
+    """
+    Draws a batched vector field as arrows, e.g. surface normals or scene flow.
+
+    The arrow geometry is expanded from the raw origins and vectors in one vectorized pass, into one of two
+    vertex buffers, reused across updates while the number of arrows fits. Colors are expanded into one of two
+    color buffers the same way, and a update of colors only does not touch the geometry. The buffers that are
+    drawn are swapped under a lock, so updates never write into the buffers being drawn.
+    """
+    def __init__(self, origins, vectors, scale=1.0, colors=(1, 1, 1, 1), width=1.0, head_size=0.2, stride=1,
+                 antialias=True, glOptions='additive'):
+        """
+        :param origins: (H, W, 3) or (N, 3) numpy array, start points of the arrows
+        :param vectors: (H, W, 3) or (N, 3) numpy array, directions and lengths of the arrows
+        :param scale: float, the arrows are vectors * scale long
+        :param colors: (N, 3) or (N, 4) numpy array of floats (0.0-1.0) or 8bit integers,
+        or tuple of floats specifying a single color.
+        :param width: float specifying line width
+        :param head_size: float, length of the arrow heads relative to the arrow length
+        :param stride: only every stride-th arrow is drawn, for dense fields
+        :param antialias: enables smooth line drawing
+        :param glOptions: str
+        """
+        super(GLQuiverItem, self).__init__(glOptions=glOptions)
+        self.scale = scale
+        self.head_size = head_size
+        self.stride = stride
+        self.vertex_buffers = [np.empty((0, 6, 3), dtype=np.float32) for _ in range(2)]
+        self.color_buffers = [np.empty((0, 6, 4), dtype=np.float32) for _ in range(2)]
+        self.vertex_back = 0
+        self.color_back = 0
+        self.lock = threading.Lock()
+        self.origins = np.empty((0, 3), dtype=np.float32)
+        self.vectors = np.empty((0, 3), dtype=np.float32)
+        self.arrow_colors = colors
+        super(GLQuiverItem, self).setData(width=width, antialias=antialias, mode='lines')
+        self.set_vectors(origins, vectors, colors)
+
+    def set_vectors(self, origins=None, vectors=None, colors=None, scale=None):
+        """
+        Update the arrows. Arguments that are None keep their previous value.
+        If the arguments are invalid, ValueError is raised and the arrows are unchanged.
+        :param origins: (H, W, 3) or (N, 3) numpy array, start points of the arrows
+        :param vectors: (H, W, 3) or (N, 3) numpy array, directions and lengths of the arrows
+        :param colors: (N, 3) or (N, 4) numpy array of floats (0.0-1.0) or 8bit integers,
+        or tuple of floats specifying a single color.
+        :param scale: float, the arrows are vectors * scale long
+        :return:
+        """
+        new_origins = self.origins
+        new_vectors = self.vectors
+        new_colors = self.arrow_colors
+        if origins is not None:
+            new_origins = utilites.reshape_vertex_map(np.asarray(origins))[::self.stride]
+        if vectors is not None:
+            new_vectors = utilites.reshape_vertex_map(np.asarray(vectors))[::self.stride]
+        if colors is not None:
+            new_colors = colors
+            if isinstance(colors, np.ndarray):
+                new_colors = utilites.reshape_vertex_map(colors)[::self.stride]
+                if new_colors.dtype.kind != 'f':
+                    new_colors = utilites.normalize_colors(new_colors)
+        count = len(new_origins)
+        if len(new_vectors) != count:
+            raise ValueError('origins and vectors must have the same number of arrows.')
+        if isinstance(new_colors, np.ndarray) and len(new_colors) != count:
+            raise ValueError('colors must have one color per arrow.')
+
+        geometry_changed = origins is not None or vectors is not None or scale is not None
+        self.origins = new_origins
+        self.vectors = new_vectors
+        self.arrow_colors = new_colors
+        if scale is not None:
+            self.scale = scale
+
+        # the back buffers are not drawn, until they are swapped in below
+        pos = None
+        if geometry_changed:
+            vertex_buffer = self.vertex_buffers[self.vertex_back]
+            if count > len(vertex_buffer):
+                vertex_buffer = np.empty((count, 6, 3), dtype=np.float32)
+                self.vertex_buffers[self.vertex_back] = vertex_buffer
+            pos = utilites.expand_arrows(self.origins, self.vectors, self.scale, self.head_size,
+                                         vertex_buffer[:count]).reshape((count * 6, 3))
+
+        color = None
+        if colors is not None:
+            color = self.arrow_colors
+            if isinstance(color, np.ndarray):
+                color_buffer = self.color_buffers[self.color_back]
+                if count > len(color_buffer) or color_buffer.shape[-1] != color.shape[-1]:
+                    color_buffer = np.empty((count, 6, color.shape[-1]), dtype=np.float32)
+                    self.color_buffers[self.color_back] = color_buffer
+                color_buffer[:count] = color[:, np.newaxis]
+                color = color_buffer[:count].reshape((count * 6, -1))
+
+        with self.lock:
+            if pos is not None:
+                self.pos = pos
+                self.vertex_back = 1 - self.vertex_back
+            if color is not None:
+                self.color = color
+                if isinstance(self.arrow_colors, np.ndarray):
+                    self.color_back = 1 - self.color_back
+        self.update()
+
+    def memory_usage(self):
+        """
+        Memory used by the arrows and the reused buffers.
+        :return: (cpu_bytes, gpu_bytes)
+        """
+        cpu_bytes = sum(buffer.nbytes for buffer in self.vertex_buffers + self.color_buffers)
+        for array in (self.origins, self.vectors):
+            if isinstance(array, np.ndarray):
+                cpu_bytes += array.nbytes
+        return cpu_bytes, 0
+
+    def paint(self):
+        with self.lock:
+            super(GLQuiverItem, self).paint()
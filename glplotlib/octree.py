@@ -0,0 +1,315 @@
+"""
+On-disk octree format for point clouds larger than memory.
+
+build_octree converts PLY or NumPy inputs, in chunks, into a directory of memory-mappable node files.
+Every node holds a random subsample of the points in its cube, up to a capacity, and passes the rest
+to its 8 children, so the nodes near the root form a coarse level of detail of the whole cloud.
+Nodes are named by their path from the root, e.g. 'r', 'r0', 'r07'.
+
+Usage: python -m glplotlib.octree input.ply output_dir
+"""
+import numpy as np
+import argparse
+import json
+import os
+
+
+NODE_DTYPE = np.dtype([('pos', '<f4', (3,)), ('color', 'u1', (4,))])
+
+METADATA_FILE = 'octree.json'
+
+# depth of the grid on which build_octree counts the points of the nodes, 8 ** 7 cells use 16MB
+COUNT_DEPTH = 7
+
+PLY_TYPES = {
+    'char': 'i1', 'uchar': 'u1', 'short': 'i2', 'ushort': 'u2', 'int': 'i4', 'uint': 'u4',
+    'float': 'f4', 'double': 'f8', 'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'
+}
+
+
+def read_ply_vertices(path):
+    """
+    Memory map the vertex element of a binary PLY file, or load it from a ascii PLY file.
+
+    Only the vertex element is read, it must be the first element of the file.
+    :param path: str, path of the PLY file
+    :return: structured numpy array with fields x, y, z and optionally red, green, blue, alpha
+    """
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError('{} is not a PLY file.'.format(path))
+        file_format = None
+        count = None
+        fields = []
+        element = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError('Unexpected end of PLY header in {}.'.format(path))
+            words = line.decode('ascii').split()
+            if not words:
+                continue
+            if words[0] == 'format':
+                file_format = words[1]
+            elif words[0] == 'element':
+                element = words[1]
+                if element == 'vertex':
+                    count = int(words[2])
+                elif count is None:
+                    raise ValueError('The vertex element must be the first element of {}.'.format(path))
+            elif words[0] == 'property' and element == 'vertex':
+                if words[1] == 'list':
+                    raise ValueError('List properties of vertices are not supported.')
+                fields.append((words[2], PLY_TYPES[words[1]]))
+            elif words[0] == 'end_header':
+                break
+        offset = f.tell()
+
+    if count is None:
+        raise ValueError('{} has no vertex element.'.format(path))
+    if file_format == 'ascii':
+        dtype = np.dtype(fields)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            rows = np.loadtxt(f, max_rows=count, usecols=range(len(fields)), ndmin=2)
+        vertices = np.empty(count, dtype=dtype)
+        for column, name in enumerate(dtype.names):
+            vertices[name] = rows[:, column]
+        return vertices
+    byte_order = '<' if file_format == 'binary_little_endian' else '>'
+    dtype = np.dtype([(name, byte_order + kind) for name, kind in fields])
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+def open_source(points, colors=None):
+    """
+    Open the input of build_octree without loading it into memory where possible.
+    :param points: str path of a .ply or .npy file, or (N, 3) numpy array of points
+    :param colors: str path of a .npy file, or (N, 3) or (N, 4) numpy array of colors, ignored for PLY input.
+    :return: function that maps a (start, stop) row range to (pos, colors), and the number of points
+    """
+    if isinstance(points, str) and points.endswith('.ply'):
+        vertices = read_ply_vertices(points)
+        names = vertices.dtype.names
+        channels = [name for name in ('red', 'green', 'blue', 'alpha') if name in names]
+
+        def read(start, stop):
+            chunk = vertices[start:stop]
+            pos = np.stack([chunk['x'], chunk['y'], chunk['z']], axis=1).astype(np.float32)
+            chunk_colors = None
+            if channels:
+                chunk_colors = np.stack([chunk[name] for name in channels], axis=1)
+            return pos, chunk_colors
+        return read, len(vertices)
+
+    if isinstance(points, str):
+        points = np.load(points, mmap_mode='r')
+    if isinstance(colors, str):
+        colors = np.load(colors, mmap_mode='r')
+
+    def read(start, stop):
+        pos = np.asarray(points[start:stop, :3], dtype=np.float32)
+        return pos, None if colors is None else np.asarray(colors[start:stop])
+    return read, len(points)
+
+
+def to_rgba8(colors, count):
+    """
+    Convert colors of a chunk to 8bit RGBA.
+    :param colors: (N, 3) or (N, 4) numpy array of 8bit integers or floats (0.0-1.0), or None for white.
+    :param count: number of points N
+    :return: (N, 4) uint8 numpy array
+    """
+    rgba = np.full((count, 4), 255, dtype=np.uint8)
+    if colors is not None:
+        if colors.dtype.kind == 'f':
+            colors = np.clip(colors * 255.0, 0, 255)
+        rgba[:, :colors.shape[1]] = colors
+    return rgba
+
+
+def grid_cells(pos, corner, half_size, depth):
+    """
+    Cells of the points in the regular grid of the octree nodes at a depth.
+    :param pos: (N, 3) numpy array of points
+    :param corner: (3,) numpy array, lower corner of the root cube
+    :param half_size: half edge length of the root cube
+    :param depth: depth of the nodes, the grid has 2 ** depth cells per axis
+    :return: (N, 3) int64 numpy array of cell indices
+    """
+    resolution = 2 ** depth
+    cells = np.floor((pos - corner) / (2.0 * half_size) * resolution).astype(np.int64)
+    return np.clip(cells, 0, resolution - 1)
+
+
+def build_octree(points, out_dir, colors=None, capacity=65536, max_depth=12, chunk_size=4000000, seed=0):
+    """
+    Convert a point cloud into a on-disk octree of memory-mappable nodes, reading the input in chunks.
+    :param points: str path of a .ply or .npy file, or (N, 3) numpy array of points
+    :param out_dir: str, directory to write the octree to, created if necessary
+    :param colors: str path of a .npy file, or (N, 3) or (N, 4) numpy array of colors, ignored for PLY input.
+    :param capacity: maximum number of points per node, except for nodes at max_depth
+    :param max_depth: maximum depth of the octree
+    :param chunk_size: number of input points processed at once
+    :param seed: seed of the random priorities of the points
+    :return: Octree, opened from out_dir
+    """
+    read, count = open_source(points, colors)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    elif any(name.endswith('.bin') or name == METADATA_FILE for name in os.listdir(out_dir)):
+        raise ValueError('{} already contains a octree.'.format(out_dir))
+
+    low = np.full(3, np.inf)
+    high = np.full(3, -np.inf)
+    has_colors = False
+    for start in range(0, count, chunk_size):
+        pos, chunk_colors = read(start, min(start + chunk_size, count))
+        pos = pos[np.isfinite(pos).all(axis=1)]
+        if len(pos):
+            low = np.minimum(low, pos.min(axis=0))
+            high = np.maximum(high, pos.max(axis=0))
+        has_colors = has_colors or chunk_colors is not None
+    if not np.isfinite(low).all():
+        raise ValueError('The point cloud has no valid points.')
+    center = (low + high) / 2.0
+    half_size = max(float((high - low).max()) / 2.0, 1e-6) * 1.0001
+
+    # priorities are uniform random numbers, independent of the order of the input. A node keeps the
+    # points of its cube below capacity / (points in its cube), so it samples its whole cube uniformly.
+    corner = center - half_size
+    count_depth = min(max_depth, COUNT_DEPTH)
+    resolution = 2 ** count_depth
+    cube_counts = np.zeros(resolution ** 3, dtype=np.int64)
+    for start in range(0, count, chunk_size):
+        pos, _ = read(start, min(start + chunk_size, count))
+        cells = grid_cells(pos[np.isfinite(pos).all(axis=1)], corner, half_size, count_depth)
+        cube_counts += np.bincount(np.ravel_multi_index(cells.T, (resolution,) * 3), minlength=len(cube_counts))
+    cube_counts = [cube_counts.reshape((resolution,) * 3)]
+    while len(cube_counts) <= count_depth:
+        size = cube_counts[0].shape[0] // 2
+        cube_counts.insert(0, cube_counts[0].reshape(size, 2, size, 2, size, 2).sum(axis=(1, 3, 5)))
+
+    node_counts = {}
+    random = np.random.RandomState(seed)
+
+    def insert(name, cell, node_center, node_half, records, priority, depth):
+        stored = node_counts.get(name, 0)
+        if depth >= max_depth:
+            taken = np.arange(len(records))
+        else:
+            if depth <= count_depth:
+                taken = np.flatnonzero(priority < capacity / float(max(cube_counts[depth][cell], 1)))
+            else:
+                taken = np.arange(len(records))
+            if len(taken) > capacity - stored:
+                taken = taken[np.argsort(priority[taken])[:max(capacity - stored, 0)]]
+        if len(taken):
+            with open(os.path.join(out_dir, name + '.bin'), 'ab') as f:
+                records[taken].tofile(f)
+            node_counts[name] = stored + len(taken)
+        if len(taken) == len(records):
+            return
+        rest = np.ones(len(records), dtype=bool)
+        rest[taken] = False
+        records = records[rest]
+        priority = priority[rest]
+        octants = ((records['pos'] >= node_center) * np.array([1, 2, 4])).sum(axis=1)
+        for octant in np.unique(octants):
+            bits = np.array([octant & 1, octant & 2, octant & 4], dtype=bool)
+            in_octant = octants == octant
+            child_center = node_center + (bits * 2.0 - 1.0) * node_half / 2.0
+            insert(name + str(octant), tuple(np.array(cell) * 2 + bits), child_center, node_half / 2.0,
+                   records[in_octant], priority[in_octant], depth + 1)
+
+    for start in range(0, count, chunk_size):
+        pos, chunk_colors = read(start, min(start + chunk_size, count))
+        valid = np.isfinite(pos).all(axis=1)
+        records = np.empty(int(valid.sum()), dtype=NODE_DTYPE)
+        records['pos'] = pos[valid]
+        records['color'] = to_rgba8(None if chunk_colors is None else chunk_colors[valid], len(records))
+        insert('r', (0, 0, 0), center, half_size, records, random.random_sample(len(records)), 0)
+
+    metadata = {
+        'version': 1,
+        'center': center.tolist(),
+        'half_size': half_size,
+        'capacity': capacity,
+        'has_colors': has_colors,
+        'nodes': node_counts
+    }
+    with open(os.path.join(out_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f)
+    return Octree(out_dir)
+
+
+class Octree(object):
+    """
+    Read access to a octree written by build_octree. Nodes are memory mapped on demand.
+    """
+    def __init__(self, path):
+        """
+        :param path: str, directory written by build_octree
+        """
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        self.center = np.array(metadata['center'])
+        self.half_size = metadata['half_size']
+        self.has_colors = metadata['has_colors']
+        self.counts = metadata['nodes']
+
+    def bounds(self, name):
+        """
+        Cube of a node.
+        :param name: str, name of the node
+        :return: (center, half_size) of the cube, center is a (3,) numpy array
+        """
+        center = self.center.copy()
+        half_size = self.half_size
+        for digit in name[1:]:
+            octant = int(digit)
+            sign = np.array([octant & 1, octant & 2, octant & 4], dtype=bool) * 2.0 - 1.0
+            half_size /= 2.0
+            center += sign * half_size
+        return center, half_size
+
+    def children(self, name):
+        """
+        :param name: str, name of the node
+        :return: list of names of the existing children
+        """
+        return [name + str(octant) for octant in range(8) if name + str(octant) in self.counts]
+
+    def load(self, name):
+        """
+        Read a node into memory.
+        :param name: str, name of the node
+        :return: (N, 3) float32 numpy array of points, and (N, 4) float32 numpy array of colors
+        """
+        records = np.memmap(os.path.join(self.path, name + '.bin'), dtype=NODE_DTYPE, mode='r',
+                            shape=(self.counts[name],))
+        pos = np.array(records['pos'])
+        colors = records['color'].astype(np.float32) / 255.0
+        del records
+        return pos, colors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a point cloud into a glplotlib octree.')
+    parser.add_argument('input', help='.ply file, or .npy file of (N, 3) points')
+    parser.add_argument('output', help='output directory')
+    parser.add_argument('--colors', default=None, help='.npy file of (N, 3) or (N, 4) colors, for .npy input')
+    parser.add_argument('--capacity', type=int, default=65536, help='maximum number of points per node')
+    parser.add_argument('--max-depth', type=int, default=12, help='maximum depth of the octree')
+    parser.add_argument('--chunk-size', type=int, default=4000000, help='number of points processed at once')
+    args = parser.parse_args()
+    octree = build_octree(args.input, args.output, colors=args.colors, capacity=args.capacity,
+                          max_depth=args.max_depth, chunk_size=args.chunk_size)
+    print('Wrote {} nodes with {} points to {}'.format(
+        len(octree.counts), sum(octree.counts.values()), args.output))
+
+
+if __name__ == '__main__':
+    main()
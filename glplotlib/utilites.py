@@ -21,3 +21,236 @@ def normalize_colors(colors):
     if colors.dtype is not np.float32:
         colors = colors.astype(np.float32) / 255.0
     return colors
+
+
+def decimate_polyline(points, indices, bucket_size):
+    """
+    Reduce one level of a polyline level-of-detail pyramid.
+
+    Consecutive vertices are grouped into buckets of bucket_size. From each bucket, the first vertex
+    and the vertex farthest away from it are kept, which preserves spikes of the polyline.
+    Incomplete trailing buckets are ignored.
+    :param points: (N, 3) numpy array, vertices of the full resolution polyline
+    :param indices: (M,) integer numpy array, indices into points of the finer level
+    :param bucket_size: number of vertices of the finer level merged into 2 vertices
+    :return: (2 * (M // bucket_size),) integer numpy array, indices into points of the coarser level
+    """
+    n_buckets = len(indices) // bucket_size
+    buckets = indices[:n_buckets * bucket_size].reshape((n_buckets, bucket_size))
+    vertices = points[buckets]
+    distances = ((vertices - vertices[:, :1]) ** 2).sum(axis=-1)
+    farthest = buckets[np.arange(n_buckets), distances.argmax(axis=1)]
+    return np.stack([buckets[:, 0], farthest], axis=1).ravel()
+
+
+def append_rows(buffer, count, values):
+    """
+    Write values after the first count rows of buffer, reallocating with doubled capacity if needed.
+    :param buffer: numpy array with spare capacity
+    :param count: number of valid rows in buffer
+    :param values: rows to be appended
+    :return: the buffer holding count + len(values) valid rows, may be a new array.
+    """
+    required = count + len(values)
+    if required > len(buffer):
+        grown = np.empty((max(required, 2 * len(buffer)),) + buffer.shape[1:], dtype=buffer.dtype)
+        grown[:count] = buffer[:count]
+        buffer = grown
+    buffer[count:required] = values
+    return buffer
+
+
+def sparse_voxels(voxels, colors=None):
+    """
+    Convert a dense occupancy grid to a list of voxel indices.
+    :param voxels: (X, Y, Z) bool numpy array, or (N, 3) integer numpy array of voxel indices
+    :param colors: (X, Y, Z, 4) numpy array of dense colors, (N, 4) numpy array,
+    or tuple of floats specifying a single color for all voxels.
+    :return: (N, 3) int32 numpy array of voxel indices, and (N, 4) float32 numpy array of colors
+    """
+    voxels = np.asarray(voxels)
+    if voxels.dtype == np.bool_ and voxels.ndim == 3:
+        indices = np.argwhere(voxels)
+        if isinstance(colors, np.ndarray) and colors.ndim == 4:
+            colors = colors[voxels]
+    else:
+        indices = voxels.reshape((-1, 3))
+    if colors is None:
+        colors = (1.0, 1.0, 1.0, 1.0)
+    result = np.empty((len(indices), 4), dtype=np.float32)
+    result[:] = colors
+    return indices.astype(np.int32), result
+
+
+def pack_voxel_keys(indices):
+    """
+    Pack voxel indices into a single int64 key per voxel. Each index must be in [-2**20, 2**20).
+    :param indices: (N, 3) integer numpy array
+    :return: (N,) int64 numpy array
+    """
+    shifted = indices.astype(np.int64) + (1 << 20)
+    if len(shifted) and (shifted.min() < 0 or shifted.max() >= 1 << 21):
+        raise ValueError('Voxel indices must be in [-2**20, 2**20).')
+    return (shifted[:, 0] << 42) | (shifted[:, 1] << 21) | shifted[:, 2]
+
+
+def preprocess_point_cloud(pos, color=None, transform=None, drop_invalid=True):
+    """
+    All conversions done on a point cloud before it is handed to a item, in one function.
+
+    Image shaped points and colors are reshaped, points with NaN or inf coordinates are dropped,
+    colors are normalized and the points are transformed.
+    :param pos: (H, W, 3) or (N, 3) shape of numpy array, representing 3D points
+    :param color: (H, W, 3) or (N, 3) shape of numpy array, representing RGB color, or None
+    :param transform: (4, 4) numpy array of homogeneous transformation, or a function that maps
+    (N, 3) numpy array to (N, 3) numpy array, or None
+    :param drop_invalid: If True, points with NaN or inf coordinates are dropped
+    :return: (N, 3) numpy array of points, and (N, C) numpy array of colors or None
+    """
+    pos = reshape_vertex_map(pos)
+    if isinstance(color, np.ndarray):
+        color = reshape_vertex_map(color)
+    if drop_invalid:
+        valid = np.isfinite(pos).all(axis=1)
+        if not valid.all():
+            pos = pos[valid]
+            if isinstance(color, np.ndarray):
+                color = color[valid]
+    if isinstance(color, np.ndarray):
+        color = normalize_colors(color)
+    if isinstance(transform, np.ndarray):
+        pos = pos.dot(transform[:3, :3].T) + transform[:3, 3]
+    elif transform is not None:
+        pos = transform(pos)
+    return pos, color
+
+
+def array_bytes(obj):
+    """
+    Sum of the bytes of all numpy arrays held as attributes of obj, including arrays in dict attributes.
+    :param obj: any object
+    :return: int
+    """
+    total = 0
+    for value in vars(obj).values():
+        if isinstance(value, dict):
+            values = value.values()
+        elif isinstance(value, (list, tuple)):
+            values = value
+        else:
+            values = [value]
+        for element in values:
+            if isinstance(element, np.ndarray):
+                total += element.nbytes
+            elif hasattr(element, '_vertexes'):
+                # pyqtgraph.opengl.MeshData
+                total += array_bytes(element)
+    return total
+
+
+def estimate_item_bytes(item):
+    """
+    Estimate the memory used by a pyqtgraph.opengl item.
+
+    Items provided by glplotlib report their usage by memory_usage(). For other items,
+    only the numpy arrays they hold are counted, their data is not resident on the GPU.
+    :param item: a pyqtgraph.opengl item
+    :return: (cpu_bytes, gpu_bytes)
+    """
+    if hasattr(item, 'memory_usage'):
+        return item.memory_usage()
+    return array_bytes(item), 0
+
+
+def downsample_item(item, min_points=1024):
+    """
+    Halve the number of points of a scatter plot item, by keeping every second point.
+
+    The kept points are copied, so the full size arrays are released.
+    :param item: a pyqtgraph.opengl item
+    :param min_points: items with less points than this are not downsampled
+    :return: Bool of whether the item was downsampled
+    """
+    pos = getattr(item, 'pos', None)
+    if not hasattr(item, 'pxMode') or not isinstance(pos, np.ndarray) or len(pos) < min_points:
+        return False
+    params = {'pos': np.ascontiguousarray(pos[::2])}
+    for name in ('color', 'size'):
+        value = getattr(item, name)
+        if isinstance(value, np.ndarray) and len(value) == len(pos):
+            params[name] = np.ascontiguousarray(value[::2])
+    item.setData(**params)
+    return True
+
+
+def changed_rows(old, new):
+    """
+    Find the rows that differ between two arrays of the same shape.
+    :param old: (N, ...) numpy array
+    :param new: (N, ...) numpy array
+    :return: (M,) int64 numpy array of the changed rows, in ascending order
+    """
+    return np.flatnonzero((old != new).reshape((len(old), -1)).any(axis=1))
+
+
+def merge_runs(starts, stops, max_gap=64, max_runs=256):
+    """
+    Merge ranges of dirty rows into a few sorted runs, to be uploaded with one call each.
+
+    Ranges that overlap or are at most max_gap rows apart are merged. If more than max_runs remain,
+    the smallest gaps between them are merged as well.
+    :param starts: (N,) integer numpy array, first rows of the ranges
+    :param stops: (N,) integer numpy array, one after the last rows of the ranges
+    :param max_gap: number of clean rows that are uploaded rather than starting a new run
+    :param max_runs: maximum number of runs
+    :return: list of (start, stop) tuples, sorted and disjoint
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    nonempty = stops > starts
+    starts, stops = starts[nonempty], stops[nonempty]
+    if len(starts) == 0:
+        return []
+    order = np.argsort(starts, kind='mergesort')
+    starts = starts[order]
+    stops = np.maximum.accumulate(stops[order])
+    gaps = starts[1:] - stops[:-1]
+    splits = np.flatnonzero(gaps > max_gap)
+    if len(splits) >= max_runs:
+        largest = np.argsort(gaps[splits], kind='mergesort')[len(splits) - max_runs + 1:]
+        splits = np.sort(splits[largest])
+    run_starts = np.concatenate([starts[:1], starts[splits + 1]])
+    run_stops = np.concatenate([stops[splits], stops[-1:]])
+    return list(zip(run_starts.tolist(), run_stops.tolist()))
+
+
+def expand_arrows(origins, vectors, scale, head_size, out):
+    """
+    Expand arrows into line segments, a shaft and two barbs per arrow, in one vectorized pass.
+    :param origins: (N, 3) numpy array, start points of the arrows
+    :param vectors: (N, 3) numpy array, directions and lengths of the arrows
+    :param scale: float, the arrows are vectors * scale long
+    :param head_size: float, length of the barbs relative to the arrow length
+    :param out: (N, 6, 3) numpy array the vertexes of the segments are written to
+    :return: out
+    """
+    scaled = vectors * scale
+    tips = origins + scaled
+    length = np.sqrt((scaled ** 2).sum(axis=1, keepdims=True))
+    # barbs lie in the plane spanned by the arrow and the z axis, or the x axis for vertical arrows
+    reference = np.zeros_like(scaled)
+    vertical = np.abs(scaled[:, 2:3]) > 0.9 * length
+    reference[:, 0:1] = vertical
+    reference[:, 2:3] = ~vertical
+    side = np.cross(scaled, reference)
+    side_length = np.sqrt((side ** 2).sum(axis=1, keepdims=True))
+    side *= head_size * 0.5 * length / np.maximum(side_length, 1e-12)
+    back = tips - head_size * scaled
+
+    out[:, 0] = origins
+    out[:, 1] = tips
+    out[:, 2] = tips
+    out[:, 3] = back + side
+    out[:, 4] = tips
+    out[:, 5] = back - side
+    return out
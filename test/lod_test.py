@@ -0,0 +1,48 @@
+import numpy as np
+
+from glplotlib import utilites
+from glplotlib.items import GLLODLinePlotItem
+
+
+def test_decimate_polyline_keeps_first_and_farthest_vertex():
+    points = np.zeros((10, 3))
+    points[3] = (5, 0, 0)
+    points[6] = (0, 9, 0)
+    reduced = utilites.decimate_polyline(points, np.arange(10), 4)
+    # the trailing incomplete bucket [8, 9] is ignored
+    assert reduced.tolist() == [0, 3, 4, 6]
+
+
+def test_level_indices_cover_the_whole_polyline():
+    item = GLLODLinePlotItem(bucket_size=4, min_level_size=16, chunk_size=64)
+    random = np.random.RandomState(0)
+    for size in (5, 17, 100, 3, 250, 1, 2):
+        item.append(random.rand(size, 3))
+    assert len(item.levels) > 1
+    for depth in range(-1, len(item.levels)):
+        indices = item.level_indices(depth)
+        assert np.all(np.diff(indices) > 0)
+        assert indices[0] == 0
+        # the vertices not yet reduced into the first level are kept at full resolution
+        unreduced = np.arange(item.levels[0][2], item.count)
+        assert np.array_equal(indices[len(indices) - len(unreduced):], unreduced)
+
+
+def test_incremental_appends_match_a_single_append():
+    random = np.random.RandomState(1)
+    pos = random.rand(1000, 3)
+    incremental = GLLODLinePlotItem(bucket_size=4, min_level_size=16, chunk_size=64)
+    start = 0
+    for size in random.randint(1, 50, 100):
+        incremental.append(pos[start:start + size])
+        start += size
+    incremental.append(pos[start:])
+    single = GLLODLinePlotItem(bucket_size=4, min_level_size=16, chunk_size=64)
+    single.append(pos)
+
+    assert len(incremental.levels) == len(single.levels)
+    for depth in range(len(single.levels)):
+        assert np.array_equal(incremental.level_indices(depth), single.level_indices(depth))
+    n_chunks = -(-len(pos) // 64)
+    assert np.array_equal(incremental.chunk_low[:n_chunks], single.chunk_low[:n_chunks])
+    assert np.array_equal(incremental.chunk_high[:n_chunks], single.chunk_high[:n_chunks])
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from glplotlib.octree import build_octree, Octree
+
+
+def all_points(octree):
+    return np.concatenate([octree.load(name)[0] for name in octree.counts])
+
+
+def sorted_rows(points):
+    return points[np.lexsort(points.T[::-1])]
+
+
+def test_nodes_hold_every_point_once(tmp_path):
+    points = np.random.RandomState(0).rand(20000, 3).astype(np.float32)
+    points[5] = np.nan
+    octree = build_octree(points, str(tmp_path), capacity=500, chunk_size=3000)
+    valid = points[np.isfinite(points).all(axis=1)]
+    assert sum(octree.counts.values()) == len(valid)
+    assert np.array_equal(sorted_rows(all_points(octree)), sorted_rows(valid))
+    for name in octree.counts:
+        center, half_size = octree.bounds(name)
+        pos, _ = octree.load(name)
+        assert np.all(np.abs(pos - center) <= half_size * 1.0001)
+        assert len(pos) <= 500
+
+
+def test_root_samples_the_whole_cloud_of_ordered_input(tmp_path):
+    # sorted along x, so a sample of the first chunks only would miss most of the cloud
+    x = np.linspace(0.0, 100.0, 300000)
+    points = np.stack([x, np.zeros_like(x), np.zeros_like(x)], axis=1)
+    octree = build_octree(points, str(tmp_path), capacity=1000, chunk_size=20000)
+    pos, _ = octree.load('r')
+    histogram, _ = np.histogram(pos[:, 0], bins=5, range=(0.0, 100.0))
+    assert len(pos) > 900
+    assert histogram.min() > 0.5 * len(pos) / 5
+
+
+def test_ply_input(tmp_path):
+    points = np.random.RandomState(1).rand(100, 3).astype(np.float32)
+    colors = np.random.RandomState(2).randint(0, 256, (100, 3)).astype(np.uint8)
+    header = 'ply\nformat {}\nelement vertex 100\nproperty float x\nproperty float y\nproperty float z\n' \
+             'property uchar red\nproperty uchar green\nproperty uchar blue\nend_header\n'
+    vertices = np.empty(100, dtype=[('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                                    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+    for column, name in enumerate('xyz'):
+        vertices[name] = points[:, column]
+    for column, name in enumerate(('red', 'green', 'blue')):
+        vertices[name] = colors[:, column]
+
+    binary = tmp_path / 'binary.ply'
+    with open(str(binary), 'wb') as f:
+        f.write(header.format('binary_little_endian 1.0').encode('ascii'))
+        f.write(vertices.tobytes())
+    ascii_ply = tmp_path / 'ascii.ply'
+    with open(str(ascii_ply), 'w') as f:
+        f.write(header.format('ascii 1.0'))
+        for point, color in zip(points, colors):
+            f.write('{} {} {} {} {} {}\n'.format(*(point.tolist() + color.tolist())))
+
+    for path in (binary, ascii_ply):
+        octree = build_octree(str(path), str(tmp_path / (path.name + '.octree')), capacity=16)
+        assert octree.has_colors
+        pos = all_points(octree)
+        rgba = np.concatenate([octree.load(name)[1] for name in octree.counts])
+        order = np.lexsort(pos.T[::-1])
+        expected = np.lexsort(points.T[::-1])
+        assert np.allclose(pos[order], points[expected], atol=1e-6)
+        assert np.allclose(rgba[order, :3] * 255.0, colors[expected])
+        assert np.all(rgba[:, 3] == 1.0)
+
+
+def test_npy_input_is_reopened(tmp_path):
+    points = np.random.RandomState(3).rand(1000, 3)
+    np.save(str(tmp_path / 'points.npy'), points)
+    build_octree(str(tmp_path / 'points.npy'), str(tmp_path / 'octree'), capacity=100)
+    octree = Octree(str(tmp_path / 'octree'))
+    assert not octree.has_colors
+    assert sum(octree.counts.values()) == 1000
+    assert set(octree.children('r')) <= set(octree.counts)
+    with pytest.raises(ValueError):
+        build_octree(points, str(tmp_path / 'octree'))
@@ -0,0 +1,85 @@
+import threading
+import time
+import numpy as np
+
+from glplotlib.glplot import GPVisualizer, SensorFeed
+
+
+class RecordingItem(object):
+    def __init__(self):
+        self.frames = []
+
+    def setData(self, **kwds):
+        self.frames.append(kwds['pos'])
+
+
+def frame(value):
+    return np.full((4, 3), value, dtype=np.float32)
+
+
+def wait_idle(feed, timeout=5.0):
+    deadline = time.time() + timeout
+    while feed.in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert feed.in_flight == 0
+
+
+def setup_feed(monkeypatch, running=True):
+    """
+    A feed whose frames are processed only once released, and whose posted apply calls are collected.
+    """
+    posted = []
+
+    def post_function_delegate(cls, func, params=None, wait=True):
+        if running:
+            posted.append(func)
+        return running
+    monkeypatch.setattr(GPVisualizer, 'post_function_delegate', classmethod(post_function_delegate))
+    monkeypatch.setattr(GPVisualizer, 'touch_item', classmethod(lambda cls, item, enforce=True: None))
+    release = threading.Event()
+
+    def transform(pos):
+        release.wait()
+        return pos
+    item = RecordingItem()
+    return SensorFeed(item, transform=transform, workers=1), item, posted, release
+
+
+def test_stale_frames_are_dropped(monkeypatch):
+    feed, item, posted, release = setup_feed(monkeypatch)
+    for value in range(4):
+        feed.push(frame(value))
+    # frame 0 is processed, 1 and 2 were replaced in the waiting slot by 3
+    assert feed.dropped == 2
+    release.set()
+    wait_idle(feed)
+    # frame 0 was replaced by frame 3 before the posted apply ran
+    assert len(posted) == 1 and feed.dropped == 3
+    posted[0]()
+    assert [pos[0, 0] for pos in item.frames] == [3.0]
+
+
+def test_frames_after_close_are_dropped(monkeypatch):
+    feed, item, posted, release = setup_feed(monkeypatch)
+    feed.push(frame(0))
+    feed.push(frame(1))
+    feed.close()
+    feed.push(frame(2))
+    release.set()
+    wait_idle(feed)
+    for apply in posted:
+        apply()
+    # the frame being processed is still applied, the waiting and later frames are not
+    assert [pos[0, 0] for pos in item.frames] == [0.0]
+    assert feed.dropped == 2
+    assert feed.pending is None
+
+
+def test_frames_are_dropped_without_event_loop(monkeypatch):
+    feed, item, posted, release = setup_feed(monkeypatch, running=False)
+    release.set()
+    feed.push(frame(0))
+    wait_idle(feed)
+    assert posted == [] and item.frames == []
+    assert feed.dropped == 1
+    assert not feed.apply_posted and feed.ready is None
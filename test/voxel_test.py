@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from glplotlib import utilites
+from glplotlib.items import GLVoxelItem, VoxelSlotIndex
+
+
+def check_voxels(item, expected):
+    assert item.count == len(expected) == len(item.index)
+    assert np.array_equal(item.index.lookup(item.keys[:item.count]), np.arange(item.count))
+    held = {tuple(index): color for index, color in zip(item.indices[:item.count].tolist(), item.colors[:item.count])}
+    assert held.keys() == expected.keys()
+    for index, color in expected.items():
+        assert np.allclose(held[index], color)
+
+
+def test_voxel_slots_match_a_dict_model():
+    random = np.random.RandomState(0)
+    item = GLVoxelItem()
+    # merge and compact the index often
+    item.index.min_merge_size = 8
+    expected = {}
+    for _ in range(500):
+        indices = random.randint(-6, 6, (random.randint(1, 40), 3))
+        if random.rand() < 0.55:
+            colors = random.rand(len(indices), 4).astype(np.float32)
+            item.set_voxels(indices, colors)
+            expected.update(zip(map(tuple, indices.tolist()), colors))
+        else:
+            item.clear_voxels(indices)
+            for index in map(tuple, indices.tolist()):
+                expected.pop(index, None)
+        check_voxels(item, expected)
+    item.clear_voxels()
+    check_voxels(item, {})
+
+
+def test_dense_grid_input():
+    occupancy = np.zeros((4, 5, 6), dtype=bool)
+    occupancy[1, 2, 3] = occupancy[3, 4, 5] = True
+    colors = np.zeros((4, 5, 6, 4), dtype=np.float32)
+    colors[3, 4, 5] = (1, 0, 0, 1)
+    item = GLVoxelItem(occupancy, colors=colors)
+    check_voxels(item, {(1, 2, 3): (0, 0, 0, 0), (3, 4, 5): (1, 0, 0, 1)})
+
+
+def test_out_of_range_indices_are_rejected():
+    item = GLVoxelItem([[0, 1, 0]])
+    # (0, 0, 2**21) would pack to the key of (0, 1, 0)
+    with pytest.raises(ValueError):
+        item.set_voxels([[0, 0, 2 ** 21]])
+    with pytest.raises(ValueError):
+        item.clear_voxels([[0, 0, 2 ** 21]])
+    check_voxels(item, {(0, 1, 0): (1, 1, 1, 1)})
+    item.set_voxels([[-2 ** 20, 2 ** 20 - 1, 0]])
+    assert item.count == 2
+
+
+def test_scattered_edits_upload_only_their_runs():
+    item = GLVoxelItem(np.stack([np.arange(100000), np.zeros(100000), np.zeros(100000)], axis=1))
+    item.dirty_starts, item.dirty_stops = [], []
+    item.set_voxels([[10, 0, 0], [99990, 0, 0]], (1, 0, 0, 1))
+    runs = utilites.merge_runs(np.concatenate(item.dirty_starts), np.concatenate(item.dirty_stops))
+    assert runs == [(10, 11), (99990, 99991)]
+
+
+def test_merge_runs():
+    assert utilites.merge_runs([5, 0, 100, 103], [6, 2, 101, 110], max_gap=2) == [(0, 2), (5, 6), (100, 110)]
+    # the smallest gaps are merged first
+    assert utilites.merge_runs([0, 10, 1000, 10000], [1, 11, 1001, 10001], max_gap=0, max_runs=2) == \
+        [(0, 1001), (10000, 10001)]
+    assert utilites.merge_runs([3], [3]) == []
+
+
+def test_slot_index_revives_removed_keys():
+    index = VoxelSlotIndex(min_merge_size=1)
+    index.insert(np.array([1, 2, 3], dtype=np.int64), np.array([0, 1, 2]))
+    index.merge()
+    index.remove(np.array([2], dtype=np.int64))
+    assert index.lookup(np.array([1, 2, 3], dtype=np.int64)).tolist() == [0, -1, 2]
+    index.insert(np.array([2], dtype=np.int64), np.array([7]))
+    assert index.lookup(np.array([1, 2, 3, 4], dtype=np.int64)).tolist() == [0, 7, 2, -1]
+    assert len(index) == 3